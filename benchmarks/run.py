@@ -0,0 +1,286 @@
+"""
+Reproducible benchmarks of distripool against a loopback cluster, with multiprocessing.Pool as baseline.
+
+Starts an orchestrator and a number of worker nodes (separate processes calling make_worker) on 127.0.0.1
+and sweeps element count, payload size, chunksize, function cost, method and the number of concurrent jobs.
+Every orchestrator brings along a built-in worker with one process per core, so the cluster has more processes than
+the worker nodes started; the multiprocessing.Pool baseline gets as many processes as the cluster has in total.
+Results are written as JSON, so that runs of different commits can be compared:
+
+    python -m benchmarks.run --output base.json
+    python -m benchmarks.run --output head.json
+    python -m benchmarks.run --compare base.json head.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any
+
+from distripool import Pool, make_orchestrator, make_worker
+
+METHODS = ("map", "imap", "starmap")
+
+
+def work(item):
+    import time
+
+    payload, cost = item
+    end = time.perf_counter() + cost
+    while time.perf_counter() < end:
+        pass
+    return payload
+
+
+def work_star(payload, cost):
+    import time
+
+    end = time.perf_counter() + cost
+    while time.perf_counter() < end:
+        pass
+    return payload
+
+
+@dataclass
+class Config:
+    backend: str
+    method: str
+    elements: int
+    payload: int
+    chunksize: int | str | None
+    cost: float
+    jobs: int
+
+    def key(self) -> str:
+        return (f"{self.backend} {self.method} elements={self.elements} payload={self.payload} "
+                f"chunksize={self.chunksize} cost={self.cost} jobs={self.jobs}")
+
+
+@dataclass
+class Result:
+    config: Config
+    seconds: float
+    throughput: float
+    call_p50: float
+    call_p99: float
+    chunk_p50: float | None = None
+    chunk_p99: float | None = None
+    bytes_sent: int | None = None
+    bytes_received: int | None = None
+
+
+def _percentile(values: List[float], q: float) -> float | None:
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def _data(config: Config):
+    payload = b"x" * config.payload
+    return [(payload, config.cost) for _ in range(config.elements)]
+
+
+def _call(pool, config: Config, data) -> float:
+    started = time.perf_counter()
+    if config.method == "map":
+        pool.map(work, data, config.chunksize)
+    elif config.method == "starmap":
+        pool.starmap(work_star, data, config.chunksize)
+    else:
+        for _ in pool.imap(work, data, config.chunksize or 1):
+            pass
+    return time.perf_counter() - started
+
+
+def _run_jobs(pool, config: Config, data, repeat: int) -> List[float]:
+    """
+    Run the configured call repeat times, each time as config.jobs concurrent jobs, and return the latency of every call.
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def run():
+        latency = _call(pool, config, data)
+        with lock:
+            latencies.append(latency)
+
+    for _ in range(repeat):
+        threads = [threading.Thread(target=run) for _ in range(config.jobs)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+    return latencies
+
+
+def _summarize(config: Config, seconds: float, latencies: List[float], repeat: int) -> Result:
+    items = config.elements * config.jobs * repeat
+    return Result(config, seconds, items / seconds, _percentile(latencies, 50), _percentile(latencies, 99))
+
+
+def _bench_distripool(pool: Pool, config: Config, repeat: int, chunk_latencies: List[float]) -> Result:
+    data = _data(config)
+    before = pool.stats()
+    chunk_latencies.clear()
+
+    started = time.perf_counter()
+    latencies = _run_jobs(pool, config, data, repeat)
+    result = _summarize(config, time.perf_counter() - started, latencies, repeat)
+
+    after = pool.stats()
+    result.chunk_p50 = _percentile(chunk_latencies, 50)
+    result.chunk_p99 = _percentile(chunk_latencies, 99)
+    result.bytes_sent = after.bytes_sent - before.bytes_sent
+    result.bytes_received = after.bytes_received - before.bytes_received
+    return result
+
+
+def _bench_multiprocessing(pool, config: Config, repeat: int) -> Result:
+    data = _data(config)
+    chunksize = config.chunksize if isinstance(config.chunksize, int) else None
+    config_for_call = Config(**{**asdict(config), "chunksize": chunksize})
+
+    started = time.perf_counter()
+    latencies = _run_jobs(pool, config_for_call, data, repeat)
+    return _summarize(config, time.perf_counter() - started, latencies, repeat)
+
+
+def _worker_node(address, processes: int):
+    # exit through SystemExit on terminate(), so that the worker shuts down its local pool.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    make_worker(address, processes=processes)
+
+
+def _start_workers(address, workers: int, processes: int) -> List[multiprocessing.Process]:
+    nodes = [multiprocessing.Process(target=_worker_node, args=(address, processes)) for _ in range(workers)]
+    [node.start() for node in nodes]
+    return nodes
+
+
+def _parse_chunksize(value: str) -> int | str | None:
+    if value == "none":
+        return None
+    if value == "adaptive":
+        return value
+    return int(value)
+
+
+def _configs(args, backend: str) -> List[Config]:
+    configs = []
+    for method, elements, payload, chunksize, cost, jobs in itertools.product(
+            args.methods, args.elements, args.payloads, args.chunksizes, args.costs, args.jobs):
+        if backend == "multiprocessing" and chunksize == "adaptive":
+            continue
+        configs.append(Config(backend, method, elements, payload, chunksize, cost, jobs))
+    return configs
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print(result: Result):
+    chunk = f" chunk p50/p99 {result.chunk_p50:.4f}/{result.chunk_p99:.4f}s" if result.chunk_p50 is not None else ""
+    traffic = f" {result.bytes_sent}B out {result.bytes_received}B in" if result.bytes_sent is not None else ""
+    print(f"{result.config.key()}: {result.throughput:,.0f} items/s "
+          f"call p50/p99 {result.call_p50:.4f}/{result.call_p99:.4f}s{chunk}{traffic}", flush=True)
+
+
+def run(args) -> Dict[str, Any]:
+    address = (f"127.0.0.1:{args.port}", f"127.0.0.1:{args.port + 1}")
+    orchestrator = make_orchestrator(address)
+    nodes = _start_workers(address, args.workers, args.processes)
+    results: List[Result] = []
+
+    chunk_latencies: List[float] = []
+    # sized from the capacity of the cluster, which includes the built-in worker the pool starts.
+    pool = Pool(orchestrator=orchestrator, chunk_callback=lambda t: chunk_latencies.append(t.returned - t.submitted))
+    try:
+        time.sleep(args.warmup)
+        capacity = orchestrator.capacity()
+        for config in _configs(args, "distripool"):
+            result = _bench_distripool(pool, config, args.repeat, chunk_latencies)
+            _print(result)
+            results.append(result)
+    finally:
+        pool.terminate()
+        [node.terminate() for node in nodes]
+        [node.join() for node in nodes]
+        orchestrator.close()
+
+    if args.baseline:
+        with multiprocessing.Pool(capacity) as mp_pool:
+            for config in _configs(args, "multiprocessing"):
+                result = _bench_multiprocessing(mp_pool, config, args.repeat)
+                _print(result)
+                results.append(result)
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.time(),
+        "workers": args.workers,
+        "processes": args.processes,
+        "capacity": capacity,
+        "repeat": args.repeat,
+        "results": [{**asdict(result), "key": result.config.key()} for result in results],
+    }
+
+
+def compare(base_path: str, head_path: str):
+    with open(base_path) as f:
+        base = {r["key"]: r for r in json.load(f)["results"]}
+    with open(head_path) as f:
+        head = {r["key"]: r for r in json.load(f)["results"]}
+
+    for key in sorted(base.keys() & head.keys()):
+        ratio = head[key]["throughput"] / base[key]["throughput"]
+        print(f"{key}: {base[key]['throughput']:,.0f} -> {head[key]['throughput']:,.0f} items/s ({ratio - 1:+.1%})")
+
+
+def main(argv: List[str] | None = None):
+    csv = lambda cast: lambda value: [cast(v) for v in value.split(",")]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2,
+                        help="number of worker nodes to start, besides the built-in worker")
+    parser.add_argument("--processes", type=int, default=2, help="processes per worker node")
+    parser.add_argument("--port", type=int, default=1437, help="first of the two loopback ports to use")
+    parser.add_argument("--methods", type=csv(str), default=list(METHODS))
+    parser.add_argument("--elements", type=csv(int), default=[1_000, 10_000])
+    parser.add_argument("--payloads", type=csv(int), default=[0, 4096], help="bytes per element")
+    parser.add_argument("--chunksizes", type=csv(_parse_chunksize), default=[None, 100, "adaptive"],
+                        help="integers, 'none' or 'adaptive'")
+    parser.add_argument("--costs", type=csv(float), default=[0.0, 0.0001], help="seconds per element")
+    parser.add_argument("--jobs", type=csv(int), default=[1, 4], help="concurrent jobs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds to wait for the worker nodes to connect")
+    parser.add_argument("--no-baseline", dest="baseline", action="store_false",
+                        help="skip the multiprocessing.Pool baseline")
+    parser.add_argument("--output", help="path of the JSON file to write the results to")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,12 +1,31 @@
+from .asyncpool import AsyncPool
 from .asyncwrap import _AsyncResult, _FutureAsync
+from .cache import ResultCache
+from .compression import Codec, LzmaCodec, ZlibCodec, register_codec
+from .objects import ObjectRef
 from .orchestrator import _Orchestrator, default_orchestrator, make_orchestrator
 from .packet import DataPacket, ResultPacket
 from .pool import Pool
+from .spill import read_results
+from .stats import ChunkTimings, CompressionStats, JobStats, PoolStats, SpeculationStats
 from .worker import _Worker, make_worker
 
 __all__ = [
     "default_orchestrator",
     "make_orchestrator",
     "Pool",
+    "AsyncPool",
+    "ObjectRef",
+    "ResultCache",
+    "read_results",
+    "Codec",
+    "ZlibCodec",
+    "LzmaCodec",
+    "register_codec",
+    "ChunkTimings",
+    "CompressionStats",
+    "JobStats",
+    "PoolStats",
+    "SpeculationStats",
     "make_worker",
 ]
\ No newline at end of file
@@ -0,0 +1,150 @@
+import asyncio
+import os
+from typing import Any, Callable, List, Iterable, AsyncIterator, Literal
+
+from distripool.cache import _CachedMap
+from distripool.job import _Job
+from distripool.packet import ResultPacket
+from distripool.pool import _PoolBase, _concatenate, _reorder
+from distripool.spill import _ResultWriter, _result_sink
+
+
+class AsyncPool(_PoolBase):
+    """
+    A variant of Pool for asyncio applications: map(), starmap() and apply() are coroutines,
+    imap() and imap_unordered() are asynchronous iterators. Takes the same arguments as Pool.
+
+    Awaiting a result neither blocks the event loop nor occupies a thread: the I/O thread of the orchestrator
+    hands results to the event loop the job was started from. Cancelling the awaiting task cancels the job;
+    its chunks that have not been started by a worker node yet are dropped.
+
+    Any number of jobs may run on an AsyncPool concurrently, e.g. with asyncio.gather(),
+    and it may share its orchestrator with other pools like Pool.
+    """
+
+    async def _stream(self, job_factory: Callable[[Callable[[ResultPacket | None], None]], _Job]) -> AsyncIterator[List]:
+        """
+        Run the job created by job_factory (given the sink for its results) to completion on the running event loop
+        and yield the result list of each chunk as soon as it is available. See _Job.
+        """
+        loop = asyncio.get_running_loop()
+        results: asyncio.Queue[ResultPacket | None] = asyncio.Queue()
+
+        def sink(result: ResultPacket | None):
+            loop.call_soon_threadsafe(results.put_nowait, result)
+
+        job = job_factory(sink)
+        try:
+            job.fill()
+            while not job.done:
+                try:
+                    result = await asyncio.wait_for(results.get(), job.timeout())
+                except asyncio.TimeoutError:
+                    result = None
+                else:
+                    if result is None:
+                        raise RuntimeError("The pool was terminated or its orchestrator was closed.")
+                for chunk_results in job.handle(result):
+                    yield chunk_results
+                job.fill()
+        finally:
+            # drops the remaining chunks and results of this job, e.g. if the awaiting task was cancelled.
+            job.close()
+
+    async def _map(self, func, iterable, chunksize, mapping_type: Literal['map', 'starmap'] = 'map') -> List:
+        if self._result_cache is not None:
+            cached = _CachedMap(self._result_cache, func, list(iterable), mapping_type)
+            return cached.merge(await self._map_uncached(func, cached.misses, chunksize, mapping_type)
+                                if cached.misses else [])
+        return await self._map_uncached(func, iterable, chunksize, mapping_type)
+
+    async def _map_uncached(self, func, iterable, chunksize, mapping_type: Literal['map', 'starmap'] = 'map') -> List:
+        stream = self._stream(lambda sink: self._map_job(func, iterable, chunksize, mapping_type, sink))
+        return [result async for chunk_results in stream for result in chunk_results]
+
+    async def _imap(self, func, iterable, chunksize, parallel_calls, mapping_type: Literal['map', 'starmap'] = 'map',
+                    ordered: bool = True):
+        stream = self._stream(lambda sink: self._imap_job(func, iterable, chunksize, parallel_calls, mapping_type,
+                                                          ordered, sink))
+        try:
+            async for chunk_results in stream:
+                for result in chunk_results:
+                    yield result
+        finally:
+            await stream.aclose()
+
+    async def apply(self, func, args: Iterable = (), kwds={}):
+        """
+        Call func with arguments args and keyword arguments kwds on one of the workers of the pool.
+        """
+        if not isinstance(args, Iterable):
+            raise TypeError(f"args must be an Iterable, was {type(args)}")
+        args = tuple(args)
+        return (await self.starmap(func, [args + tuple(kwds.values())]))[0]
+
+    async def map(self, func: Callable, iterable: List, chunksize: int = None) -> List:
+        """
+        A parallel equivalent of the map() built-in function (it supports only one iterable argument though). See Pool.map().
+        """
+        return await self._map(func, iterable, chunksize, 'map')
+
+    async def map_batches(self, func: Callable, data, batch_size: int = None):
+        """
+        A vectorized variant of map(), where func is called once per chunk. See Pool.map_batches().
+        """
+        stream = self._stream(lambda sink: self._batches_job(func, data, batch_size, sink))
+        return _concatenate([chunk_results async for chunk_results in stream])
+
+    async def map_by_key(self, func: Callable, iterable: Iterable, key: Callable | None = None,
+                         chunksize: int = None) -> List:
+        """
+        Like map(), except that all elements with the same key are sent to the same worker node. See Pool.map_by_key().
+        """
+        chunks = self._keyed_chunker(iterable, key, chunksize)
+        stream = self._stream(lambda sink: self._open_job(func, chunks, sink=sink))
+        return _reorder([result async for chunk_results in stream for result in chunk_results], chunks.order)
+
+    async def map_to(self, func: Callable, iterable: Iterable, sink: Callable[[Any], None] | str | os.PathLike,
+                     chunksize: int | Literal['adaptive'] = 'adaptive', parallel_calls: int = None) -> int:
+        """
+        Pass the results of func applied to the elements of iterable to sink in order, rather than collecting them.
+        sink is called on the event loop. See Pool.map_to().
+        """
+        write = _result_sink(sink)
+        count = 0
+        stream = self._stream(lambda results: self._imap_job(func, iterable, chunksize, parallel_calls, sink=results))
+        try:
+            async for chunk_results in stream:
+                for result in chunk_results:
+                    write(result)
+                count += len(chunk_results)
+        finally:
+            await stream.aclose()
+            if isinstance(write, _ResultWriter):
+                write.close()
+        return count
+
+    async def starmap(self, func, iterable, chunksize=None) -> List:
+        """
+        Like map() except that the elements of the iterable are expected to be iterables that are unpacked as arguments.
+        """
+        return await self._map(func, iterable, chunksize, 'starmap')
+
+    def imap(self, func, iterable, chunksize=1, parallel_calls=None) -> AsyncIterator:
+        """
+        A lazier version of map(), to be used with 'async for'. See Pool.imap().
+        Breaking out of the loop cancels the remaining chunks.
+        """
+        return self._imap(func, iterable, chunksize, parallel_calls, 'map', ordered=True)
+
+    def imap_unordered(self, func, iterable, chunksize=1, parallel_calls=None) -> AsyncIterator:
+        """
+        The same as imap() except that the results are yielded in the order in which the chunks complete.
+        """
+        return self._imap(func, iterable, chunksize, parallel_calls, 'map', ordered=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.terminate()
@@ -7,7 +7,10 @@ class _FutureAsync:
     def _nop(x):
         pass
 
-    def __init__(self, target, args, callback, error_callback):
+    def __init__(self, target, args, callback, error_callback, future: ft.Future | None = None):
+        """
+        Run target(*args) on a thread of its own, or, if future is given, wrap that future, which is resolved elsewhere.
+        """
         self._result = None
 
         if callback is None:
@@ -15,8 +18,11 @@ class _FutureAsync:
         if error_callback is None:
             error_callback = _FutureAsync._nop
 
-        executor = ft.ThreadPoolExecutor(max_workers=1)
-        self.future = executor.submit(target, *args)
+        executor = None
+        if future is None:
+            executor = ft.ThreadPoolExecutor(max_workers=1)
+            future = executor.submit(target, *args)
+        self.future = future
 
         def handler(f: ft.Future):
             e = f.exception()
@@ -26,7 +32,8 @@ class _FutureAsync:
             error_callback(e)
 
         self.future.add_done_callback(handler)
-        executor.shutdown(cancel_futures=False, wait=False)
+        if executor is not None:
+            executor.shutdown(cancel_futures=False, wait=False)
 
     def ready(self):
         return self.future.done()
@@ -46,9 +53,9 @@ class _FutureAsync:
 
 
 class _AsyncResult:
-    def __init__(self, pool, target, args, callback, error_callback):
+    def __init__(self, pool, target, args, callback, error_callback, future: ft.Future | None = None):
         self._pool = pool
-        self._async = _FutureAsync(target, args, callback, error_callback)
+        self._async = _FutureAsync(target, args, callback, error_callback, future)
 
     def _check_terminated(self):
         if self._pool._terminated:
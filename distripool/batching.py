@@ -0,0 +1,117 @@
+import concurrent.futures as ft
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from distripool.asyncwrap import _AsyncResult
+from distripool.chunking import _FixedChunker
+from distripool.packet import ResultPacket
+
+_Call = Tuple[Tuple[tuple, dict], ft.Future]
+
+
+class _ApplyBatcher:
+    def __init__(self, pool, batch_size: int, linger: float):
+        """
+        Coalesce apply_async() calls of a pool into shared packets: calls are buffered per function
+        until batch_size of them are pending or the oldest pending call waited for linger seconds.
+        Each batch is shipped as a single chunk and its results are fanned back out to the individual AsyncResults,
+        without a thread per call or per batch. An error only fails the call that raised it.
+        """
+        self._pool = pool
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+
+        self._pending: Dict[Callable, List[_Call]] = {}
+        self._deadline: float | None = None
+        self._full = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, func, args: tuple, kwds: dict, callback, error_callback) -> _AsyncResult:
+        future = ft.Future()
+        future.set_running_or_notify_cancel()
+        async_result = _AsyncResult(self._pool, None, (), callback, error_callback, future)
+
+        with self._condition:
+            if self._closed:
+                raise ValueError("Pool not running")
+            calls = self._pending.setdefault(func, [])
+            calls.append(((args, kwds), future))
+            if self._deadline is None:
+                self._deadline = time.monotonic() + self.linger
+                self._condition.notify()
+            if len(calls) >= self.batch_size:
+                self._full = True
+                self._condition.notify()
+        return async_result
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._full and (
+                        self._deadline is None or time.monotonic() < self._deadline):
+                    self._condition.wait(None if self._deadline is None else self._deadline - time.monotonic())
+                if self._closed and not self._pending:
+                    return
+                batches, self._pending = self._pending, {}
+                self._deadline, self._full = None, False
+
+            for func, calls in batches.items():
+                for i in range(0, len(calls), self.batch_size):
+                    self._dispatch(func, calls[i:i + self.batch_size])
+
+    def _dispatch(self, func, calls: List[_Call]):
+        futures = [future for _, future in calls]
+        lock = threading.Lock()
+        job = None
+        done = 0  # the number of calls resolved, since the results of a batch may arrive in parts
+
+        def fail(e: BaseException):
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+
+        def sink(result: ResultPacket | None):
+            # called by the I/O thread of the orchestrator; the lock keeps it from racing job.fill().
+            with lock:
+                if result is None:
+                    fail(RuntimeError("The pool was terminated or its orchestrator was closed."))
+                    return
+                try:
+                    ready = job.handle(result)
+                except Exception as e:
+                    fail(e)
+                    job.close()
+                    return
+                nonlocal done
+                for chunk_results in ready:
+                    for future, (ok, value) in zip(futures[done:], chunk_results):
+                        if ok:
+                            future.set_result(value)
+                        else:
+                            future.set_exception(value)
+                    done += len(chunk_results)
+                if job.done:
+                    job.close()
+
+        with lock:
+            try:
+                job = self._pool._open_job(func, _FixedChunker([call for call, _ in calls], len(calls)), 'apply',
+                                           sink=sink)
+                job.fill()
+            except Exception as e:
+                fail(e)
+                if job is not None:
+                    job.close()
+
+    def close(self):
+        """
+        Dispatch the pending calls right away and stop accepting new ones.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
@@ -0,0 +1,193 @@
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, List, Tuple
+
+from distripool.registry import _describe_function
+
+_CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+_MISSING = object()
+
+
+class ResultCache:
+    def __init__(self, maxsize: int = 4096, path: str | None = None, max_disk_bytes: int = 1 << 30,
+                 ttl: float | None = None):
+        """
+        A cache of the results of map() and starmap(), keyed by the hash of the source code of the function and the
+        hash of the pickled arguments. Pass it to a Pool to only dispatch the elements it has not seen before:
+        Pool(result_cache=ResultCache(path="results.sqlite")).
+
+        Results are kept in memory, the least recently used ones are evicted beyond maxsize.
+        If path is given, they are also written to an SQLite database at path, which outlives the process
+        and is consulted on misses in memory; the least recently used results are deleted beyond max_disk_bytes.
+
+        Only the source code of the function is hashed, so results are not invalidated if e.g. a global it reads changes.
+        Arguments whose pickle is not deterministic (e.g. sets of strings across processes) may miss the cache.
+        A cached result is returned as is, so it should not be mutated.
+
+        :param ttl: If not None, results expire that many seconds after they were computed.
+        """
+        self.maxsize = max(0, maxsize)
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._results: OrderedDict[str, Tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_bytes = 0  # the size of the values on disk, kept up to date rather than summed on every put
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("CREATE TABLE IF NOT EXISTS results "
+                             "(key TEXT PRIMARY KEY, value BLOB, expires REAL, used REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+            self._disk_bytes, = self._db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM results").fetchone()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def _expired(self, expires: float | None, now: float) -> bool:
+        return expires is not None and expires <= now
+
+    def get(self, key: str, default=None) -> Any:
+        with self._lock:
+            value = self._get(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def _get(self, key: str) -> Any:
+        now = time.time()
+        entry = self._results.get(key)
+        if entry is not None:
+            if not self._expired(entry[0], now):
+                self._results.move_to_end(key)
+                return entry[1]
+            del self._results[key]
+
+        if self._db is None:
+            return _MISSING
+        row = self._db.execute("SELECT value, expires FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return _MISSING
+        if self._expired(row[1], now):
+            self._delete(key)
+            return _MISSING
+        self._db.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+        value = pickle.loads(row[0])
+        self._remember(key, row[1], value)
+        return value
+
+    def _remember(self, key: str, expires: float | None, value):
+        if self.maxsize == 0:
+            return
+        self._results[key] = (expires, value)
+        self._results.move_to_end(key)
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def put(self, key: str, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, items: List[Tuple[str, Any]]):
+        """
+        Store the given (key, result) pairs, writing them to disk in a single transaction.
+        """
+        now = time.time()
+        expires = now + self.ttl if self.ttl is not None else None
+        with self._lock:
+            for key, value in items:
+                self._remember(key, expires, value)
+            if self._db is None or not items:
+                return
+            self._db.execute("BEGIN")
+            try:
+                for key, value in items:
+                    self._delete(key)
+                    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                    self._db.execute("INSERT INTO results VALUES (?, ?, ?, ?)", (key, data, expires, now))
+                    self._disk_bytes += len(data)
+                self._shrink(keep=items[-1][0])
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self._disk_bytes, = self._db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM results").fetchone()
+                raise
+            self._db.execute("COMMIT")
+
+    def _delete(self, key: str):
+        row = self._db.execute("SELECT LENGTH(value) FROM results WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._disk_bytes -= row[0]
+
+    def _shrink(self, keep: str):
+        # the result just stored is never deleted, even if it exceeds max_disk_bytes on its own.
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._db.execute("SELECT key, LENGTH(value) FROM results WHERE key != ? "
+                                    "ORDER BY used, rowid LIMIT 64", (keep,)).fetchall()
+            if not rows:
+                return
+            for key, length in rows:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._disk_bytes -= length
+                if self._disk_bytes <= self.max_disk_bytes:
+                    return
+
+    def info(self) -> _CacheInfo:
+        return _CacheInfo(self.hits, self.misses, self.maxsize, len(self._results))
+
+    def clear(self):
+        """
+        Remove all results, including those on disk.
+        """
+        with self._lock:
+            self._results.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._disk_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class _CachedMap:
+    def __init__(self, cache: ResultCache, func: Callable, items: List, mapping_type: str = 'map'):
+        """
+        The lookup of the elements of a single map() or starmap() call in a ResultCache.
+        Only the misses have to be dispatched; merge() fills their results in and stores them.
+        The mapping type is part of the key, since map(f, [(1, 2)]) and starmap(f, [(1, 2)]) call f differently.
+        """
+        self.cache = cache
+        func_hash, _ = _describe_function(func)
+        self.keys = [self._key(func_hash, mapping_type, item) for item in items]
+        self.results = [cache.get(key, _MISSING) for key in self.keys]
+        self.missing = [i for i, result in enumerate(self.results) if result is _MISSING]
+        self.misses = [items[i] for i in self.missing]
+
+    @staticmethod
+    def _key(func_hash: str, mapping_type: str, item) -> str:
+        digest = hashlib.sha256(func_hash.encode())
+        digest.update(mapping_type.encode())
+        digest.update(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+        return digest.hexdigest()
+
+    def merge(self, results: List) -> List:
+        """
+        :param results: The results of the misses, in order.
+        :return: The results of all elements.
+        """
+        for i, result in zip(self.missing, results):
+            self.results[i] = result
+        self.cache.put_many([(self.keys[i], self.results[i]) for i in self.missing])
+        return self.results
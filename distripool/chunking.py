@@ -0,0 +1,153 @@
+import itertools
+import math
+import pickle
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+from distripool.routing import _route
+
+
+class _FixedChunker:
+    route: int | None = None  # the route of the chunk returned last, see _KeyedChunker
+
+    def __init__(self, iterable: Iterable, chunk_size: int):
+        """
+        Lazily split iterable into chunks of chunk_size elements (the last one possibly being shorter).
+        """
+        self._iterator = iter(iterable)
+        self.chunk_size = max(1, chunk_size)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> List:
+        chunk = list(itertools.islice(self._iterator, self.chunk_size))
+        if not chunk:
+            raise StopIteration
+        return chunk
+
+    def observe(self, size: int, elapsed: float, roundtrip: float):
+        """
+        Feed back the time a chunk of size elements took on its worker (elapsed) and in total (roundtrip).
+        Fixed chunks ignore it.
+        """
+        pass
+
+
+class _AdaptiveChunker(_FixedChunker):
+    def __init__(self, iterable: Iterable, capacity: int, target_duration: float = 0.1,
+                 probe_size: int = 1, max_size: int | None = None, smoothing: float = 0.5, overhead_factor: float = 10):
+        """
+        Lazily split iterable into chunks whose size adapts to the measured per-item cost.
+
+        The first chunks are small probes. Afterward, chunks are sized such that they take about target_duration
+        on a worker, where the target is raised to overhead_factor times the measured per-packet overhead if that is larger.
+        If the length of iterable is known, chunks taper off towards the end like in guided scheduling
+        (at most the remaining elements divided by capacity), so that no single large chunk holds up the job.
+
+        :param capacity: The number of chunks that are processed in parallel across the cluster.
+        :param smoothing: The weight of a new measurement in the exponential moving averages of the costs.
+        """
+        super().__init__(iterable, probe_size)
+        self.capacity = max(1, capacity)
+        self.target_duration = target_duration
+        self.max_size = max_size
+        self.smoothing = smoothing
+        self.overhead_factor = overhead_factor
+
+        self.item_time: float | None = None
+        self.overhead: float | None = None
+        self._remaining = len(iterable) if hasattr(iterable, "__len__") else None
+
+    def _average(self, average: float | None, value: float) -> float:
+        if average is None:
+            return value
+        return self.smoothing * value + (1 - self.smoothing) * average
+
+    def observe(self, size: int, elapsed: float, roundtrip: float):
+        self.item_time = self._average(self.item_time, elapsed / size)
+        self.overhead = self._average(self.overhead, max(0.0, roundtrip - elapsed))
+
+    def _next_size(self) -> int:
+        size = self.chunk_size
+        if self.item_time is not None:
+            target = max(self.target_duration, self.overhead_factor * self.overhead)
+            size = target / max(self.item_time, 1e-9)
+        if self._remaining is not None:
+            size = min(size, math.ceil(self._remaining / self.capacity))
+        if self.max_size is not None:
+            size = min(size, self.max_size)
+        return max(1, int(size))
+
+    def __next__(self) -> List:
+        self.chunk_size = self._next_size()
+        chunk = super().__next__()
+        if self._remaining is not None:
+            self._remaining -= len(chunk)
+        return chunk
+
+
+class _SliceChunker(_FixedChunker):
+    def __init__(self, data, chunk_size: int):
+        """
+        Split data into slices of chunk_size elements rather than copying them into lists, if data supports slicing.
+        Slices of NumPy arrays and memoryviews are views, which are pickled out-of-band and hence never copied
+        on the orchestrator; memoryviews are passed on as pickle.PickleBuffer, since they cannot be pickled themselves.
+        Other iterables are split into lists like by _FixedChunker.
+        """
+        super().__init__(() if _sliceable(data) else data, chunk_size)
+        self._data = data if _sliceable(data) else None
+        self._offset = 0
+
+    def __next__(self):
+        if self._data is None:
+            return super().__next__()
+        if self._offset >= len(self._data):
+            raise StopIteration
+        chunk = self._data[self._offset:self._offset + self.chunk_size]
+        self._offset += self.chunk_size
+        return pickle.PickleBuffer(chunk) if isinstance(chunk, memoryview) else chunk
+
+
+class _KeyedChunker(_FixedChunker):
+    def __init__(self, iterable: Iterable, key: Callable[[object], Hashable], chunk_size: int | None,
+                 capacity: int, owner: Callable[[int], bytes | None]):
+        """
+        Split iterable into chunks whose elements belong to the same worker, given owner, which maps the route
+        of an element's key to its worker. Within a worker's share, elements with equal keys are adjacent,
+        so that they share chunks. Each chunk is routed by the key of its first element.
+
+        Unlike the other chunkers, iterable is consumed right away. order holds the indices of the elements
+        in chunk order, such that the results can be put back into the order of iterable.
+
+        :param chunk_size: Defaults to one chunk per process across the shares.
+        """
+        shares: Dict[bytes | None, List[Tuple[int, int, object]]] = {}
+        count = 0
+        for i, item in enumerate(iterable):
+            route = _route(key(item))
+            shares.setdefault(owner(route), []).append((route, i, item))
+            count += 1
+        chunk_size = max(1, count // max(1, capacity)) if chunk_size is None else max(1, chunk_size)
+
+        self._chunks: List[Tuple[int, List]] = []
+        self.order: List[int] = []
+        for share in shares.values():
+            share.sort(key=lambda element: element[0])  # stable, hence the order of iterable is kept per key
+            for start in range(0, len(share), chunk_size):
+                elements = share[start:start + chunk_size]
+                self._chunks.append((elements[0][0], [item for _, _, item in elements]))
+                self.order.extend(i for _, i, _ in elements)
+        super().__init__((), chunk_size)
+        self._iterator = iter(self._chunks)
+
+    def __next__(self) -> List:
+        self.route, chunk = next(self._iterator)
+        return chunk
+
+
+def _sliceable(data) -> bool:
+    return hasattr(data, "__getitem__") and hasattr(data, "__len__") and not isinstance(data, dict)
+
+
+def _chunk_length(chunk) -> int:
+    return len(chunk.raw()) if isinstance(chunk, pickle.PickleBuffer) else len(chunk)
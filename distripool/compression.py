@@ -0,0 +1,141 @@
+import lzma
+import time
+import zlib
+from typing import Dict, List, Tuple
+
+from distripool.stats import CompressionStats
+
+
+class Codec:
+    """
+    A compression algorithm for the frames sent between the orchestrator and the worker nodes.
+    Subclass it to plug in another algorithm: frames name the codec they were compressed with,
+    so both ends must know it, e.g. by passing the same codec to make_orchestrator() and make_worker()
+    or by calling register_codec() on both ends.
+    """
+    name = "none"
+
+    def compress(self, data) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibCodec(Codec):
+    name = "zlib"
+
+    def __init__(self, level: int = 1):
+        self.level = level
+
+    def compress(self, data) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data) -> bytes:
+        return zlib.decompress(data)
+
+
+class LzmaCodec(Codec):
+    name = "lzma"
+
+    def __init__(self, preset: int = 0):
+        self.preset = preset
+
+    def compress(self, data) -> bytes:
+        return lzma.compress(data, preset=self.preset)
+
+    def decompress(self, data) -> bytes:
+        return lzma.decompress(data)
+
+
+_codecs: Dict[str, Codec] = {"zlib": ZlibCodec(), "lzma": LzmaCodec()}
+
+
+def register_codec(codec: Codec):
+    """
+    Make frames compressed with codec decodable in this process.
+    """
+    _codecs[codec.name] = codec
+
+
+def _codec(codec: str | Codec) -> Codec:
+    if isinstance(codec, Codec):
+        register_codec(codec)
+        return codec
+    if codec not in _codecs:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {sorted(_codecs)} or a Codec")
+    return _codecs[codec]
+
+
+class _Compressor:
+    def __init__(self, codec: str | Codec = "zlib", threshold: int = 4096, max_ratio: float = 0.9,
+                 probe_interval: int = 16):
+        """
+        Compress the frames of outgoing messages that are at least threshold bytes large.
+
+        The compression ratio is tracked per message type (e.g. chunks, results): once frames of a type compress
+        to more than max_ratio of their size, e.g. because they hold already compressed data, frames of that type
+        are sent as they are, except for every probe_interval-th frame, which is compressed to sample the ratio again.
+        Frames that do not compress to less than max_ratio of their size are always sent as they are.
+        """
+        self.codec = _codec(codec)
+        self.threshold = threshold
+        self.max_ratio = max_ratio
+        self.probe_interval = max(1, probe_interval)
+        self.stats = CompressionStats()
+        self._ratios: Dict[str, float] = {}
+        self._skipped: Dict[str, int] = {}
+
+    def _worth_trying(self, kind: str) -> bool:
+        if self._ratios.get(kind, 0.0) <= self.max_ratio:
+            return True
+        self._skipped[kind] = self._skipped.get(kind, 0) + 1
+        if self._skipped[kind] < self.probe_interval:
+            return False
+        self._skipped[kind] = 0
+        return True
+
+    def compress(self, frames: List, kind: str) -> Tuple[bytes, List]:
+        """
+        :return: A tuple of the header describing which frames are compressed (see _decompress) and the frames.
+        """
+        flags = bytearray(len(frames))
+        out = list(frames)
+        for i, frame in enumerate(frames):
+            size = memoryview(frame).nbytes
+            if size < self.threshold or not self._worth_trying(kind):
+                continue
+            started = time.perf_counter()
+            compressed = self.codec.compress(frame)
+            self.stats.compress_time += time.perf_counter() - started
+            ratio = len(compressed) / size
+            # smoothed, such that a single incompressible frame does not disable compression right away.
+            self._ratios[kind] = ratio if kind not in self._ratios else 0.5 * ratio + 0.5 * self._ratios[kind]
+            if ratio > self.max_ratio:
+                continue
+            flags[i] = 1
+            out[i] = compressed
+            self.stats.frames += 1
+            self.stats.bytes_in += size
+            self.stats.bytes_out += len(compressed)
+        if not any(flags):
+            return b"", out
+        return self.codec.name.encode() + b"\0" + bytes(flags), out
+
+
+def _decompress(header, frames: List, stats: CompressionStats | None = None) -> List:
+    """
+    Undo _Compressor.compress, given its header, which is empty if no frame was compressed.
+    """
+    if not header:
+        return frames
+    name, flags = bytes(header).split(b"\0", 1)
+    codec = _codecs.get(name.decode())
+    if codec is None:
+        raise ValueError(f"Received frames compressed with the unknown codec {name.decode()!r}, "
+                         f"register it with register_codec() on this node")
+    started = time.perf_counter()
+    frames = [codec.decompress(frame) if flag else frame for frame, flag in zip(frames, flags)]
+    if stats is not None:
+        stats.decompress_time += time.perf_counter() - started
+    return frames
@@ -0,0 +1,157 @@
+import dataclasses
+import time
+from typing import Callable, Dict, List, Literal
+
+from distripool.chunking import _FixedChunker, _chunk_length
+from distripool.objects import _references
+from distripool.packet import DataPacket, ResultPacket
+from distripool.registry import _describe_function
+from distripool.speculation import _Speculator
+from distripool.transport import _Pickled
+from distripool.stats import _JobRecorder
+
+
+class _Job:
+    def __init__(self, pool, func, chunks: _FixedChunker, mapping_type: Literal['map', 'starmap', 'apply', 'batch'] = 'map',
+                 window: int | Callable[[], int] | None = None, ordered: bool = True,
+                 sink: Callable[[ResultPacket | None], None] | None = None, part_size: int | None = None):
+        """
+        The state of a single map-like call of a pool, independent of how its results are awaited.
+
+        Chunks are dispatched lazily by fill(), keeping at most window chunks in flight (unbounded if None).
+        The window may be a callable, which is asked again on every fill(), e.g. to follow the capacity of the cluster.
+        Every result of the job is passed to handle(), which returns the result lists of the chunks that can be
+        yielded now: in chunk order if ordered is set, otherwise in order of completion.
+        If the pool has a stream_size, chunks are split into parts of that many items, whose result lists are
+        yielded as soon as they arrive (and, if ordered is set, all preceding results have been yielded).
+        Chunks are also split into parts of part_size items, which a worker node runs on its idle processes side by side.
+        The timings of each finished chunk are fed back to the chunker and recorded in the stats of the pool.
+        If the pool is speculative, stragglers at the tail of the job are re-dispatched and the slower copy is dropped.
+
+        :param sink: Passed on to _Orchestrator._open_job.
+        """
+        self.pool = pool
+        self.orchestrator = pool.orchestrator
+        self.func_name = func.__name__
+        self.func_hash, self.func_source = _describe_function(func)
+        self.chunks = chunks
+        self.mapping_type = mapping_type
+        self.window = window
+        self.ordered = ordered
+        sizes = [size for size in (pool._stream_size, part_size) if size is not None]
+        self.part_size = min(sizes) if sizes else None
+
+        self._in_flight: Dict[int, DataPacket] = {}
+        self._sent_at: Dict[int, float] = {}
+        self._finished: Dict[int, List[List]] = {}  # the result lists of the parts received, by chunk
+        self._parts: Dict[int, int] = {}  # the number of parts received of the chunks in flight
+        self._next_id = 0
+        self._next_yield = 0
+        self._exhausted = False
+        self._speculator = _Speculator(pool._speculation_factor) if pool._speculative else None
+        # pickled here rather than on the I/O thread of the orchestrator, so that e.g. a lambda fails this call.
+        self._initializer = _Pickled.dump(pool._initializer)
+        self._initargs = _Pickled.dump(pool._initargs)
+
+        self.id = self.orchestrator._open_job(sink, pool._share)
+        pool._open_jobs.add(self.id)
+        self._recorder = _JobRecorder(self.id, self.func_name)
+
+    @property
+    def done(self) -> bool:
+        return self._exhausted and not self._in_flight
+
+    def fill(self):
+        window = self.window() if callable(self.window) else self.window
+        while not self._exhausted and (window is None or len(self._in_flight) < window):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self._exhausted = True
+                return
+            objects = _references(chunk, self.mapping_type) if self.pool._stored_objects else ()
+            # pickled right away, so that the worker node can pass the chunk on to its LocalPool without unpickling it.
+            packet = DataPacket(self._next_id, self.func_source, self.func_name, self._split(chunk), self.mapping_type,
+                                self._initializer, self._initargs, self.pool._maxtasksperchild,
+                                self.func_hash, self.id, objects=objects, items=_chunk_length(chunk),
+                                route=self.chunks.route, profile=self.pool._profile)
+            self.orchestrator._send_work(packet)
+            self._in_flight[self._next_id] = packet
+            self._sent_at[self._next_id] = time.perf_counter()
+            self._next_id += 1
+
+    def _split(self, chunk) -> List[_Pickled]:
+        size = self.part_size
+        if size is None or self.mapping_type == 'batch' or len(chunk) <= size:
+            return [_Pickled.dump(chunk)]
+        return [_Pickled.dump(chunk[i:i + size]) for i in range(0, len(chunk), size)]
+
+    def timeout(self) -> float | None:
+        """
+        :return: How long to wait for the next result before calling handle(None), or None to wait indefinitely.
+        """
+        if self._speculator is None or not self._exhausted:
+            return None
+        return self._speculator.timeout(self._sent_at)
+
+    def handle(self, result: ResultPacket | None) -> List[List]:
+        """
+        Process the next result of the job, or None if waiting for it timed out. Raises the error the result holds, if any.
+
+        :return: The result lists of the chunks that are ready to be yielded.
+        """
+        if result is None:
+            for chunk_id in self._speculator.stragglers(self._sent_at):
+                self.orchestrator._send_work(dataclasses.replace(self._in_flight[chunk_id], attempt=1))
+            return []
+        if result.id not in self._in_flight:  # the slower copy of a speculated chunk
+            if self._speculator is not None and not result.func_missing and result.final:
+                self._speculator.duplicate(result.id)
+            return []
+        if result.func_missing:
+            work = dataclasses.replace(self._in_flight[result.id], attempt=result.attempt)
+            self.orchestrator._send_work(work, with_function=True)
+            return []
+        if result.holds_error():
+            raise result.result
+        if result.part != self._parts.get(result.id, 0):
+            # a part received from another attempt already, e.g. of a chunk that was speculated or dispatched again
+            return []
+
+        self._parts[result.id] = result.part + 1
+        if result.profile is not None:
+            self.pool._record_profile(self.func_hash, result.profile)
+        self._finished.setdefault(result.id, []).append(result.result)
+        if result.final:
+            self._complete(result)
+
+        if not self.ordered:
+            return self._finished.pop(result.id)
+        ready = []
+        while self._next_yield in self._finished:
+            ready.extend(self._finished.pop(self._next_yield))
+            if self._next_yield in self._in_flight:  # the remaining parts of the chunk are yet to come
+                break
+            self._next_yield += 1
+        return ready
+
+    def _complete(self, result: ResultPacket):
+        packet = self._in_flight.pop(result.id)
+        del self._parts[result.id]
+        roundtrip = time.perf_counter() - self._sent_at.pop(result.id)
+        if self._speculator is not None:
+            self._speculator.finished(result.id, result.attempt, roundtrip)
+            if self._speculator.is_speculated(result.id):
+                self.orchestrator._cancel_work(self.id, result.id)
+        if result.attempt == 0:
+            self.chunks.observe(packet.items, result.timings.execute, roundtrip)
+        self._recorder.add(result.timings)
+        self.pool._record_chunk(result.timings)
+
+    def close(self):
+        """
+        Drop the remaining chunks and results of this job, e.g. if the caller abandoned it, and record its stats.
+        """
+        self.orchestrator._close_job(self.id)
+        self.pool._open_jobs.discard(self.id)
+        self.pool._record_job(self._recorder.finish(),
+                              self._speculator.close() if self._speculator is not None else None)
@@ -0,0 +1,115 @@
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool as LocalPool
+from typing import Any, Callable, Iterable, List
+
+
+@dataclass
+class _PoolConfig:
+    initializer: Any = None
+    initargs: Any = None
+    maxtasksperchild: int | None = None
+
+
+@dataclass
+class _WarmPool:
+    config: _PoolConfig
+    pool: Any
+    running: int = 0
+    last_used: float = 0.0
+
+
+class _LocalPoolCache:
+    def __init__(self, processes: int, maxsize: int = 4, idle_timeout: float | None = None,
+                 factory: Callable[..., Any] = LocalPool):
+        """
+        The local process pools of a worker node, kept warm per configuration (initializer, initargs, maxtasksperchild),
+        so that jobs alternating between a few configurations do not pay for spawning processes
+        and running the initializer every time they switch.
+
+        Configurations are compared by equality, so initargs need not be hashable.
+
+        :param maxsize: The number of pools to keep. Beyond that, the least recently used idle pool is terminated.
+        Pools executing chunks are never terminated, so the cache may exceed maxsize while they run.
+        :param idle_timeout: If not None, pools that were idle for that many seconds are terminated by expire().
+        :param factory: Creates a pool given processes, initializer, initargs and maxtasksperchild.
+        """
+        self.processes = processes
+        self.maxsize = max(1, maxsize)
+        self.idle_timeout = idle_timeout
+        self._factory = factory
+        self._pools: List[_WarmPool] = []  # the least recently used first
+
+    def __len__(self) -> int:
+        return len(self._pools)
+
+    def _find(self, config: _PoolConfig) -> _WarmPool | None:
+        for i, warm in enumerate(self._pools):
+            if warm.config == config:
+                self._pools.append(self._pools.pop(i))
+                return warm
+        return None
+
+    def get(self, config: _PoolConfig) -> _WarmPool:
+        """
+        :return: The pool of the given configuration, created if there is none yet.
+        """
+        warm = self._find(config)
+        if warm is None:
+            pool = self._factory(processes=self.processes, initializer=config.initializer,
+                                 initargs=config.initargs or (), maxtasksperchild=config.maxtasksperchild)
+            warm = _WarmPool(config, pool, last_used=time.monotonic())
+            self._pools.append(warm)
+            self._evict(keep=warm)
+        return warm
+
+    def acquire(self, config: _PoolConfig) -> _WarmPool:
+        """
+        Get the pool of the given configuration for a chunk, which keeps it from being terminated until release().
+        """
+        warm = self.get(config)
+        warm.running += 1
+        return warm
+
+    def release(self, warm: _WarmPool):
+        warm.running -= 1
+        warm.last_used = time.monotonic()
+        self._evict()
+
+    def prewarm(self, configs: Iterable[_PoolConfig]):
+        for config in configs:
+            self.get(config)
+
+    def _terminate(self, warm: _WarmPool):
+        self._pools.remove(warm)
+        warm.pool.terminate()
+
+    def _evict(self, keep: _WarmPool | None = None):
+        """
+        :param keep: A pool never to terminate, e.g. the one just created for a chunk that has not acquired it yet.
+        """
+        idle = [warm for warm in self._pools if warm.running == 0 and warm is not keep]
+        for warm in idle[:max(0, len(self._pools) - self.maxsize)]:
+            self._terminate(warm)
+
+    def expire(self) -> float | None:
+        """
+        Terminate the pools that were idle for longer than idle_timeout.
+
+        :return: The number of seconds until the next pool expires, or None if none will.
+        """
+        if self.idle_timeout is None:
+            return None
+        now = time.monotonic()
+        remaining = None
+        for warm in [warm for warm in self._pools if warm.running == 0]:
+            left = warm.last_used + self.idle_timeout - now
+            if left <= 0:
+                self._terminate(warm)
+            elif remaining is None or left < remaining:
+                remaining = left
+        return remaining
+
+    def close(self):
+        for warm in list(self._pools):
+            self._terminate(warm)
@@ -0,0 +1,194 @@
+import hashlib
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+
+from distripool.transport import _dumps
+
+
+@dataclass(frozen=True)
+class ObjectRef:
+    """
+    A handle to an object stored in the cluster with Pool.put(). Pass it in place of the object as an argument of a task:
+    each worker node receives the object once and caches it, and the function is called with the object itself.
+
+    Handles are only resolved as direct arguments, i.e. as the elements of the iterable passed to map()
+    or as the elements of the argument tuples passed to starmap() or apply(), not inside other containers.
+    """
+    key: str
+    size: int
+
+
+def _dump_object(obj) -> Tuple[str, List[bytes]]:
+    """
+    :return: A tuple of the content hash of obj and the frames of obj pickled with out-of-band buffers.
+    The frames are copies, so that later changes to obj do not affect the stored object.
+    """
+    frames = [bytes(frame) for frame in _dumps(obj)]
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(struct.pack("<Q", len(frame)))
+        digest.update(frame)
+    return digest.hexdigest(), frames
+
+
+def _write_object(path: str, frames: Iterable) -> int:
+    frames = list(frames)
+    with open(path, "wb") as f:
+        f.write(struct.pack(f"<Q{len(frames)}Q", len(frames), *(len(frame) for frame in frames)))
+        for frame in frames:
+            f.write(frame)
+        return f.tell()
+
+
+def _map_frames(path: str) -> List[memoryview]:
+    """
+    Memory-map the frames written by _write_object rather than reading them.
+    """
+    with open(path, "rb") as f:
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    count, = struct.unpack_from("<Q", view)
+    offset = 8 * (count + 1)
+    frames = []
+    for length in struct.unpack_from(f"<{count}Q", view, 8):
+        frames.append(view[offset:offset + length])
+        offset += length
+    return frames
+
+
+def _read_object(path: str) -> Any:
+    """
+    Load an object written by _write_object. Its out-of-band buffers are memory-mapped,
+    so that e.g. large NumPy arrays are shared by all processes of a worker node instead of being copied into each.
+    """
+    frames = _map_frames(path)
+    return pickle.loads(frames[0], buffers=frames[1:])
+
+
+class _ObjectCache:
+    def __init__(self, maxsize: int = 16):
+        """
+        A bounded LRU cache of loaded objects kept by every LocalPool subprocess, keyed by the path of the stored object.
+        """
+        self.maxsize = maxsize
+        self._objects: OrderedDict[str, Any] = OrderedDict()
+
+    def get(self, path: str) -> Any:
+        if path in self._objects:
+            self._objects.move_to_end(path)
+            return self._objects[path]
+
+        obj = _read_object(path)
+        self._objects[path] = obj
+        if len(self._objects) > self.maxsize:
+            self._objects.popitem(last=False)
+        return obj
+
+
+_object_cache = _ObjectCache()
+
+
+def _arguments(item, mapping_type: str) -> Iterable:
+    if mapping_type == 'map':
+        return (item,)
+    if mapping_type == 'apply':
+        args, kwargs = item
+        return (*args, *kwargs.values())
+    return item
+
+
+def _references(chunk: List, mapping_type: str) -> Tuple[str, ...]:
+    """
+    :return: The keys of all objects the ObjectRefs among the arguments of the chunk refer to.
+    """
+    if mapping_type == 'batch':  # the chunk is data rather than arguments
+        return ()
+    return tuple({arg.key for item in chunk for arg in _arguments(item, mapping_type) if isinstance(arg, ObjectRef)})
+
+
+def _resolve_objects(chunk: List, mapping_type: str, paths: Dict[str, str]) -> List:
+    """
+    Replace the ObjectRefs among the arguments of the chunk by the objects they refer to,
+    loaded from the given local paths (once per process, see _ObjectCache).
+    """
+    def resolve(arg):
+        return _object_cache.get(paths[arg.key]) if isinstance(arg, ObjectRef) else arg
+
+    if mapping_type == 'map':
+        return [resolve(item) for item in chunk]
+    if mapping_type == 'apply':
+        return [(tuple(resolve(arg) for arg in args), {name: resolve(arg) for name, arg in kwargs.items()})
+                for args, kwargs in chunk]
+    return [tuple(resolve(arg) for arg in item) for item in chunk]
+
+
+class _ObjectStore:
+    def __init__(self, max_bytes: int = 1 << 30):
+        """
+        The objects a worker node received, keyed by their content hash. Each object is kept in a file in shared memory
+        (/dev/shm where available) which LocalPool subprocesses map directly, so objects are not pickled again per chunk.
+        The least recently used objects are evicted once the store exceeds max_bytes,
+        except for those pinned by chunks that are queued or running.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._directory = tempfile.mkdtemp(prefix="distripool-",
+                                           dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._pins: Dict[str, int] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sizes
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self._directory, key)
+
+    def put(self, key: str, frames: Iterable):
+        if key in self._sizes:
+            self._sizes.move_to_end(key)
+            return
+        self._sizes[key] = _write_object(self.path(key), frames)
+        self.size += self._sizes[key]
+        self._evict()
+
+    def _evict(self):
+        # the most recently used object is never evicted, even if it exceeds max_bytes on its own.
+        for key in list(self._sizes)[:-1]:
+            if self.size <= self.max_bytes:
+                return
+            if self._pins.get(key, 0) == 0:
+                self.size -= self._sizes.pop(key)
+                os.unlink(self.path(key))
+
+    def acquire(self, keys: Iterable[str]) -> bool:
+        """
+        Pin the given objects, so that they are not evicted until released.
+
+        :return: False, without pinning any, if one of them is not stored.
+        """
+        keys = list(keys)
+        if not all(key in self._sizes for key in keys):
+            return False
+        for key in keys:
+            self._sizes.move_to_end(key)
+            self._pins[key] = self._pins.get(key, 0) + 1
+        return True
+
+    def release(self, keys: Iterable[str]):
+        for key in keys:
+            self._pins[key] -= 1
+            if self._pins[key] == 0:
+                del self._pins[key]
+        self._evict()
+
+    def close(self):
+        shutil.rmtree(self._directory, ignore_errors=True)
@@ -1,43 +1,533 @@
+import dataclasses
+import itertools
+import pickle
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Tuple, Callable, List, Any, Deque, Dict, Set
+
 import zmq
-from typing import Tuple, Callable, List, Any
 
-from distripool.packet import DataPacket, ResultPacket
+from distripool.compression import Codec, _Compressor
+from distripool.packet import DataPacket, ResultPacket, ReadyPacket, CreditPacket, StealPacket, ReturnPacket, \
+    CancelPacket, ObjectPacket, HeartbeatPacket
+from distripool.objects import ObjectRef, _dump_object
+from distripool.routing import _Ring
+from distripool.scheduler import _Scheduler
+from distripool.stats import CompressionStats
+from distripool.worker import _Worker
+from distripool.transport import _Waker, _Pickled, _send_object, _receive_object, _loads
 
 _orchestrator = None
 
 
+@dataclass
+class _Peer:
+    processes: int
+    prefetch: int = 0
+    name: str = ""
+    local: bool = False  # the built-in worker, whose messages are never compressed
+    outstanding: int = 0
+    stealing: bool = False
+    functions: Set[str] = field(default_factory=set)
+    objects: Set[str] = field(default_factory=set)
+    last_seen: float = field(default_factory=time.monotonic)
+    work: Dict[Tuple[int, int, int], Tuple[DataPacket, bool]] = field(default_factory=dict)
+
+    @property
+    def slots(self) -> int:
+        return self.processes + self.prefetch
+
+    @property
+    def free(self) -> int:
+        return self.slots - self.outstanding
+
+    @property
+    def queued(self) -> int:
+        return self.outstanding - self.processes
+
+
 class _Orchestrator:
-    def __init__(self, listen_on: Tuple[str, str]):
+    def __init__(self, listen_on: Tuple[str, str], work_stealing: bool = False, heartbeat_timeout: float = 10.0,
+                 compression: str | Codec | None = None, compression_threshold: int = 4096):
         self.context = zmq.Context()
         self.listen_on = listen_on
-        self.sender = self.context.socket(zmq.PUSH)
+        self.sender = self.context.socket(zmq.ROUTER)
         self.sender.bind(f"tcp://{listen_on[0]}")
         self.receiver = self.context.socket(zmq.PULL)
         self.receiver.bind(f"tcp://{listen_on[1]}")
-        self.free = True
+        # the built-in worker of the pools skips TCP, see _local_worker.
+        self._inproc = (f"inproc://distripool-{id(self)}-work", f"inproc://distripool-{id(self)}-results")
+        self.sender.bind(self._inproc[0])
+        self.receiver.bind(self._inproc[1])
+        self._worker: _Worker | None = None
+        self._pools = 0
+        self.work_stealing = work_stealing
+        self.heartbeat_timeout = heartbeat_timeout
+        self._compressor = _Compressor(compression, compression_threshold) if compression is not None else None
+        self._compression = self._compressor.stats if self._compressor is not None else CompressionStats()
+
+        self._peers: Dict[bytes, _Peer] = {}
+        self._capacity = 0
+        self._ring = _Ring()
+        self._queue = _Scheduler()
+        self._queue_lock = threading.Lock()
+        self._assignments: Dict[Tuple[int, int], Set[bytes]] = {}
+        self._timestamps: Dict[Tuple[int, int, int], List[float]] = {}
+        self._jobs: Dict[int, Callable[[ResultPacket | None], None]] = {}
+        self._results: Dict[int, queue.SimpleQueue[ResultPacket | None]] = {}
+        self._outbox: Deque[Tuple[bytes, Any]] = deque()
+        self._objects: Dict[str, List[bytes]] = {}
+        self._object_owners: Dict[str, Set[int]] = {}
+        self._jobs_lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._waker = _Waker()
+        self._closing = False
+        self._running = True
+        self._loop_thread = threading.Thread(target=self._loop, daemon=True)
+        self._loop_thread.start()
+
+    @property
+    def free(self) -> bool:
+        """
+        Whether no Pool is using this orchestrator.
+        """
+        return self._pools == 0
+
+    def _acquire(self, priority: int = 0, weight: float = 1.0) -> int:
+        """
+        Attach a Pool, whose jobs share the worker nodes with those of the other Pools of this orchestrator
+        according to priority and weight, see _Scheduler.
 
-    def _acquire(self):
-        if not self.free:
-            raise ValueError("The orchestrator was attempted to be acquired while it is not free. " +
-                             "Perhaps it is in use by another Pool already. " +
-                             "If you want to use two Pools simultaneously, create another orchestrator.")
-        self.free = False
+        :return: The id of the share of the Pool, to be passed to _open_job and _release.
+        """
+        with self._queue_lock:
+            share = self._queue.open_share(priority, weight)
+            self._pools += 1
+        return share
 
-    def _release(self):
-        self.free = True
+    def _release(self, share: int):
+        with self._queue_lock:
+            self._queue.close_share(share)
+            self._pools -= 1
 
-    def _send_work(self, work: DataPacket):
-        self.sender.send_pyobj(work)
+    def _send_work(self, work: DataPacket, with_function: bool = False):
+        """
+        Queue work for the worker nodes. It is dispatched to whichever worker has free credits.
+        A function's source is only shipped to a worker the first time it sees its hash (or if with_function is set);
+        afterward, the packet only carries the hash and a worker that lost the source asks for it again.
+        The same goes for the stored objects the work refers to.
+        Repeated attempts of a chunk (work.attempt > 0) are never sent to a worker that already holds that chunk.
+        Work with a route is only sent to the worker owning that route (see _owner), except for repeated attempts.
+        Work of different Pools is interleaved by their priorities and weights, see _Scheduler.
+        Work of a job that is unknown or was closed already is dropped.
+        """
+        # the job lock is held while queueing, so that _close_job cannot forget the job in between.
+        with self._jobs_lock:
+            if work.job not in self._jobs:
+                return
+            with self._queue_lock:
+                self._queue.append((work, with_function))
+                self._timestamps[(work.job, work.id, work.attempt)] = [time.time(), 0.0, 0]
+        self._waker.wake()
 
-    def _receive_result(self) -> ResultPacket:
-        return self.receiver.recv_pyobj()
+    def _local_worker(self) -> _Worker:
+        """
+        The worker node every Pool of this orchestrator brings along, started by the first Pool.
+        It connects through inproc:// and outlives the pools, so that creating a pool does not start a worker
+        and its local processes stay warm; it is closed together with the orchestrator.
+        """
+        with self._jobs_lock:
+            if self._closing:
+                raise RuntimeError("The orchestrator was closed.")
+            if self._worker is None:
+                self._worker = _Worker(self._inproc, context=self.context)
+                threading.Thread(target=self._worker.start, daemon=True).start()
+            return self._worker
+
+    def compression_stats(self) -> CompressionStats:
+        """
+        :return: A snapshot of the compression of the frames sent to the worker nodes and the time spent
+        decompressing the results they sent back. See make_orchestrator's compression.
+        """
+        return dataclasses.replace(self._compression)
+
+    def capacity(self) -> int:
+        """
+        :return: The total number of processes of the worker nodes currently connected to this orchestrator.
+        """
+        return self._capacity
+
+    def _owner(self, route: int) -> bytes | None:
+        """
+        :return: The identity of the worker currently owning route, or None while no workers are connected.
+        Routes are spread over the workers in proportion to their processes, and only the routes of a worker
+        that joins or leaves move. See _Ring.
+        """
+        return self._ring.owner(route)
+
+    def _put_object(self, obj, owner: int = 0) -> ObjectRef:
+        """
+        Store obj, to be shipped to each worker node ahead of the first chunk that refers to it.
+        Objects are kept until all owners (e.g. the Pools that stored the same object) dropped them.
+        """
+        key, frames = _dump_object(obj)
+        with self._queue_lock:
+            self._objects[key] = frames
+            self._object_owners.setdefault(key, set()).add(owner)
+        return ObjectRef(key, sum(len(frame) for frame in frames))
+
+    def _drop_object(self, key: str, owner: int = 0):
+        with self._queue_lock:
+            owners = self._object_owners.get(key, set())
+            owners.discard(owner)
+            if not owners:
+                self._object_owners.pop(key, None)
+                self._objects.pop(key, None)
+
+    def _open_job(self, sink: Callable[[ResultPacket | None], None] | None = None, share: int | None = None) -> int:
+        """
+        Register a new job. Work of this job must be tagged with the returned id;
+        its results are routed to the job and can be fetched with _receive_result.
+
+        :param sink: If not None, results are passed to sink instead, by the I/O thread of the orchestrator,
+        and None is passed once the orchestrator or the job is closed (see _close_job).
+        Must not block, e.g. hand the result to an event loop.
+        :param share: The share returned by _acquire the work of this job is scheduled by.
+        """
+        with self._jobs_lock:
+            if self._closing:
+                raise RuntimeError("The orchestrator was closed.")
+            job = next(self._job_ids)
+            if sink is None:
+                self._results[job] = queue.SimpleQueue()
+                sink = self._results[job].put
+            self._jobs[job] = sink
+        with self._queue_lock:
+            self._queue.assign(job, share)
+        return job
+
+    def _close_job(self, job: int, notify: bool = False):
+        """
+        Unregister a job. Its chunks that were not dispatched yet are dropped, as are results arriving late.
+        Workers holding chunks of the job are told to drop the ones they have not started yet.
+
+        :param notify: If set, None is passed to the sink of the job, e.g. to wake up a caller still waiting
+        for its results because the pool was terminated.
+        """
+        with self._jobs_lock:
+            sink = self._jobs.pop(job, None)
+            self._results.pop(job, None)
+        if notify and sink is not None:
+            self._deliver(sink, None)
+        with self._queue_lock:
+            self._queue.forget(job)
+            holders = set().union(*(identities for key, identities in self._assignments.items() if key[0] == job))
+            self._assignments = {key: identities for key, identities in self._assignments.items() if key[0] != job}
+            self._timestamps = {key: stamps for key, stamps in self._timestamps.items() if key[0] != job}
+            self._outbox.extend((identity, CancelPacket(job)) for identity in holders)
+        if holders:
+            self._waker.wake()
+
+    def _cancel_work(self, job: int, chunk_id: int):
+        """
+        Drop the chunk of the given job if it was not dispatched yet, e.g. a speculative copy that is no longer needed.
+        """
+        with self._queue_lock:
+            self._queue.remove(lambda work: (work.job, work.id) == (job, chunk_id))
+
+    def _receive_result(self, job: int, timeout: float | None = None) -> ResultPacket | None:
+        """
+        :return: The next result of the given job, or None if timeout seconds passed without one.
+        """
+        results = self._results.get(job)
+        if results is None:  # closed, e.g. by terminate() while the caller was handling its previous result
+            raise RuntimeError("The pool was terminated or its orchestrator was closed.")
+        try:
+            result = results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if result is None:
+            raise RuntimeError("The pool was terminated or its orchestrator was closed.")
+        return result
+
+    def _loop(self):
+        poller = zmq.Poller()
+        poller.register(self.sender, zmq.POLLIN)
+        poller.register(self.receiver, zmq.POLLIN)
+        poller.register(self._waker, zmq.POLLIN)
+
+        while self._running:
+            events = dict(poller.poll(self.heartbeat_timeout * 1000 / 4))
+            try:
+                if self._waker.fileno() in events:
+                    self._waker.clear()
+                if self.sender in events:
+                    self._handle_control()
+                if self.receiver in events:
+                    self._handle_results()
+                self._expire_peers()
+                self._send_outbox()
+                self._dispatch()
+            except Exception as e:  # the I/O thread serves all pools, so it must outlive any single bad message
+                print(e, flush=True, file=sys.stderr)
+
+        self.sender.close(linger=0)
+        self.receiver.close(linger=0)
+        with self._jobs_lock:
+            sinks = list(self._jobs.values())
+        for sink in sinks:
+            self._deliver(sink, None)
+
+    def _handle_control(self):
+        while True:
+            try:
+                (identity,), message = _receive_object(self.sender, envelope=1, flags=zmq.NOBLOCK,
+                                                       stats=self._compression)
+            except zmq.Again:
+                return
+            except Exception as e:  # e.g. compressed with a codec unknown here; drop it, see make_orchestrator
+                print(f"Dropped a message that could not be decoded: {e}", flush=True, file=sys.stderr)
+                continue
+
+            if isinstance(message, ReadyPacket) or (isinstance(message, HeartbeatPacket)
+                                                    and identity not in self._peers):
+                self._remove_peer(identity)
+                local = self._worker is not None and message.name == self._worker.name
+                self._peers[identity] = _Peer(message.processes, message.prefetch, message.name, local)
+                self._update_capacity()
+                continue
+
+            peer = self._peers.get(identity)
+            if peer is None:  # a worker that registered with a previous orchestrator
+                continue
+            peer.last_seen = time.monotonic()
+            if isinstance(message, CreditPacket):
+                peer.outstanding = max(0, peer.outstanding - message.credits)
+            elif isinstance(message, ReturnPacket):
+                peer.stealing = False
+                peer.outstanding = max(0, peer.outstanding - len(message.work))
+                for work in message.work:
+                    peer.work.pop((work.job, work.id, work.attempt), None)
+                with self._queue_lock:
+                    # stolen chunks go to the idle workers, whether or not they own their routes.
+                    self._queue.requeue((dataclasses.replace(work, route=None), True) for work in message.work)
+
+    def _update_capacity(self):
+        self._capacity = sum(peer.processes for peer in self._peers.values())
+        self._ring = _Ring((peer.name or identity.hex(), peer.processes, identity)
+                           for identity, peer in self._peers.items())
+
+    def _remove_peer(self, identity: bytes):
+        """
+        Forget a worker that left, putting the chunks it had not returned yet back into the queue.
+        """
+        peer = self._peers.pop(identity, None)
+        if peer is None:
+            return
+        self._update_capacity()
+        with self._jobs_lock:
+            work = [item for item in peer.work.values() if item[0].job in self._jobs]
+            with self._queue_lock:
+                for item in work:
+                    self._assignments.get((item[0].job, item[0].id), set()).discard(identity)
+                self._queue.requeue(work)
+
+    def _expire_peers(self):
+        deadline = time.monotonic() - self.heartbeat_timeout
+        for identity in [identity for identity, peer in self._peers.items() if peer.last_seen < deadline]:
+            self._remove_peer(identity)
+
+    def _handle_results(self):
+        while True:
+            try:
+                frames = self.receiver.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                return
+            returned = time.time()
+            try:
+                result = _loads(frames, self._compression)
+            except Exception as e:
+                print(f"Dropped a message that could not be decoded: {e}", flush=True, file=sys.stderr)
+                continue
+            submitted, sent, sent_bytes = returned, returned, 0
+            if result.final:  # the worker is still busy with the chunk after sending the results of a part of it
+                for peer in self._peers.values():
+                    peer.work.pop((result.job, result.id, result.attempt), None)
+                with self._queue_lock:
+                    self._assignments.pop((result.job, result.id), None)
+                    submitted, sent, sent_bytes = self._timestamps.pop((result.job, result.id, result.attempt),
+                                                                       (returned, returned, 0))
+
+            if isinstance(result.result, _Pickled):
+                started = time.perf_counter()
+                try:
+                    result.result = result.result.load()
+                except Exception as e:
+                    result.result = e
+                if result.timings is not None:
+                    result.timings.load = time.perf_counter() - started
+            if result.timings is not None:
+                result.timings.submitted, result.timings.sent, result.timings.returned = submitted, sent, returned
+                result.timings.sent_bytes = sent_bytes
+                result.timings.returned_bytes = sum(len(frame) for frame in frames)
+
+            with self._jobs_lock:
+                sink = self._jobs.get(result.job)
+            if sink is not None:  # otherwise, the job was abandoned
+                self._deliver(sink, result)
+
+    @staticmethod
+    def _deliver(sink: Callable[[ResultPacket | None], None], result: ResultPacket | None):
+        try:
+            sink(result)
+        except Exception as e:  # e.g. the event loop of an abandoned job was closed; keep serving the other jobs
+            print(e, flush=True, file=sys.stderr)
+
+    def _send_outbox(self):
+        while True:
+            with self._queue_lock:
+                if not self._outbox:
+                    return
+                identity, message = self._outbox.popleft()
+            if isinstance(message, CancelPacket) and identity in self._peers:
+                work = self._peers[identity].work
+                for key in [key for key in work if key[0] == message.job]:
+                    del work[key]
+            self._send_to(identity, message)
+
+    def _send_to(self, identity: bytes, message) -> int:
+        """
+        Send message to the worker with the given identity, compressing large frames unless it is the built-in worker.
+
+        :return: The number of bytes sent.
+        """
+        peer = self._peers.get(identity)
+        compressor = self._compressor if peer is None or not peer.local else None
+        return _send_object(self.sender, message, [identity], compressor=compressor)
+
+    def _peers_by_capacity(self) -> List[bytes]:
+        """
+        :return: The identities of all workers with free credits, the ones with the most free capacity first.
+        """
+        candidates = [(peer.free / peer.slots, peer.free, identity)
+                      for identity, peer in self._peers.items() if peer.free > 0]
+        return [identity for _, _, identity in sorted(candidates, reverse=True)]
+
+    def _pop_work_for(self, identity: bytes) -> Tuple[DataPacket, bool] | None:
+        def eligible(work: DataPacket) -> bool:
+            if work.attempt > 0 and identity in self._assignments.get((work.job, work.id), ()):
+                return False
+            return work.route is None or work.attempt > 0 or self._ring.owner(work.route) == identity
+
+        with self._queue_lock:
+            item = self._queue.pop(eligible)
+            if item is not None:
+                self._assignments.setdefault((item[0].job, item[0].id), set()).add(identity)
+        return item
+
+    def _record_sent(self, work: DataPacket, sent_bytes: int):
+        with self._queue_lock:
+            if (stamps := self._timestamps.get((work.job, work.id, work.attempt))) is not None:
+                stamps[1] = time.time()
+                stamps[2] += sent_bytes
+
+    def _send_objects(self, identity: bytes, peer: _Peer, work: DataPacket, resend: bool) -> int:
+        """
+        Send the objects work refers to that the worker has not received yet (all of them if resend is set).
+
+        :return: The number of bytes sent.
+        """
+        sent_bytes = 0
+        for key in work.objects:
+            if resend or key not in peer.objects:
+                with self._queue_lock:
+                    frames = self._objects[key]
+                message = ObjectPacket(key, [pickle.PickleBuffer(frame) for frame in frames])
+                sent_bytes += self._send_to(identity, message)
+                peer.objects.add(key)
+        return sent_bytes
+
+    def _fail_work(self, work: DataPacket, error: Exception):
+        with self._queue_lock:
+            self._assignments.pop((work.job, work.id), None)
+            self._timestamps.pop((work.job, work.id, work.attempt), None)
+        with self._jobs_lock:
+            sink = self._jobs.get(work.job)
+        if sink is not None:
+            self._deliver(sink, ResultPacket(work.id, error, job=work.job, attempt=work.attempt))
+
+    def _dispatch(self):
+        dispatched = True
+        while dispatched:
+            dispatched = False
+            for identity in self._peers_by_capacity():
+                item = self._pop_work_for(identity)
+                if item is None:
+                    continue
+
+                work, with_function = item
+                peer = self._peers[identity]
+                peer.work[(work.job, work.id, work.attempt)] = item
+                try:
+                    sent_bytes = self._send_objects(identity, peer, work, with_function)
+                except KeyError as e:
+                    del peer.work[(work.job, work.id, work.attempt)]
+                    self._fail_work(work, KeyError(f"The object {e} was deleted before its chunk was dispatched."))
+                    dispatched = True
+                    break
+                if not with_function and work.func_hash in peer.functions:
+                    work = dataclasses.replace(work, func=None)
+                try:
+                    sent_bytes += self._send_to(identity, work)
+                except Exception as e:  # e.g. a chunk that cannot be pickled fails its job, not the orchestrator
+                    del peer.work[(work.job, work.id, work.attempt)]
+                    self._fail_work(work, e)
+                    dispatched = True
+                    break
+                peer.functions.add(work.func_hash)
+                peer.outstanding += 1
+                self._record_sent(work, sent_bytes)
+                dispatched = True
+                break
+
+        if self.work_stealing and not self._queue:
+            self._steal()
+
+    def _steal(self):
+        """
+        Ask the worker with the most queued, not yet started chunks to hand some back,
+        if the orchestrator has nothing left to hand out but another worker is idle.
+        """
+        idle = sum(-peer.queued for peer in self._peers.values() if peer.queued < 0)
+        if idle == 0:
+            return
+
+        victims = [(peer.queued, identity) for identity, peer in self._peers.items()
+                   if peer.queued > 0 and not peer.stealing]
+        if not victims:
+            return
+
+        count, identity = max(victims)
+        self._peers[identity].stealing = True
+        self._send_to(identity, StealPacket(min(count, idle)))
 
     def close(self):
         """
         Close the _Orchestrator instance, including its sockets and context.
         """
-        self.sender.close()
-        self.receiver.close()
+        with self._jobs_lock:
+            self._closing = True
+        if self._worker is not None:
+            # while the I/O thread still serves it, so that it never blocks sending to closed sockets.
+            self._worker.close()
+        self._running = False
+        self._waker.wake()
+        self._loop_thread.join()
+        self._waker.close()
         self.context.term()
 
 
@@ -51,21 +541,38 @@ def default_orchestrator() -> _Orchestrator:
     return _orchestrator
 
 
-def make_orchestrator(listen_on: Tuple[str, str] = ("*:1337", "*:1338")) -> _Orchestrator:
+def make_orchestrator(listen_on: Tuple[str, str] = ("*:1337", "*:1338"), work_stealing: bool = False,
+                      heartbeat_timeout: float = 10.0, compression: str | Codec | None = None,
+                      compression_threshold: int = 4096) -> _Orchestrator:
     """
     Create a new _Orchestrator instance and return it. If this is the first call to 'make_orchestrator',
-    the created orchestrator will be set as default. If you do not plan to use multiple orchestrators or multiple pools in parallel,
-    you do not have to worry about the processed orchestrator.
+    the created orchestrator will be set as default. If you do not plan to use multiple orchestrators,
+    you do not have to worry about the processed orchestrator. Any number of Pools may share an orchestrator.
+
+    Work is not dealt round-robin: workers announce credits sized to their number of processes
+    and chunks go to whichever worker has the most free capacity.
 
     :param listen_on: A tuple of two strings representing the addresses of the outbound and inbound sockets.
     The outbound socket is used to send data to the worker nodes for processing, while the inbound socket
     is used to receive results back from the workers.
-    :return: An instance of _Worker.
+    :param work_stealing: If set, idle workers steal chunks that other workers have prefetched but not started yet.
+    Only has an effect for workers started with prefetch > 0.
+    :param heartbeat_timeout: Workers that were not heard from for that many seconds are considered gone;
+    the chunks they had not returned are dispatched to other workers. See make_worker's heartbeat_interval.
+    :param compression: If not None, frames of at least compression_threshold bytes sent to the worker nodes
+    (chunks, functions and stored objects) are compressed with this codec: 'zlib', 'lzma' or a Codec instance.
+    Frames that do not compress well are sent as they are; see orchestrator.compression_stats().
+    Frames sent to the built-in worker are never compressed. Workers decompress frames of any known codec, whether or
+    not they compress their results themselves (see make_worker's compression).
+    A message compressed with a codec unknown to the receiving node (see register_codec) is dropped and logged
+    to stderr, so a custom Codec has to be registered on all nodes.
+    :param compression_threshold: The size in bytes below which frames are not compressed.
+    :return: An instance of _Orchestrator.
     """
-    orch = _Orchestrator(listen_on=listen_on)
+    orch = _Orchestrator(listen_on=listen_on, work_stealing=work_stealing, heartbeat_timeout=heartbeat_timeout,
+                         compression=compression, compression_threshold=compression_threshold)
     global _orchestrator
     if _orchestrator is None:
         _orchestrator = orch
 
     return orch
-
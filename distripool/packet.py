@@ -1,24 +1,112 @@
 import multiprocessing
 from dataclasses import dataclass
-from typing import Literal, List
+from typing import Any, Dict, Literal, List, Tuple
+
+from distripool.stats import ChunkTimings
+from distripool.transport import _Pickled
 
 
 @dataclass
 class DataPacket:
+    """
+    A chunk of a job. The chunk is pickled in one or more parts, which a worker executes on its idle processes
+    side by side, sending back a ResultPacket per part in order as soon as it is done.
+    The initializer and initargs are pickled by the Pool as well, such that the orchestrator never has to pickle
+    anything it may fail on.
+    """
     id: int
-    func: str
+    func: str | None
     func_name: str
-    chunk: List[any]
-    mapping_type: Literal['map', 'starmap'] = 'map'
-    initializer: any = None
-    initargs: any = None
+    chunk: List[_Pickled]
+    mapping_type: Literal['map', 'starmap', 'apply', 'batch'] = 'map'
+    initializer: _Pickled | None = None
+    initargs: _Pickled | None = None
     maxtasksperchild: int | None = None
+    func_hash: str | None = None
+    job: int = 0
+    attempt: int = 0
+    objects: Tuple[str, ...] = ()
+    items: int = 0
+    route: int | None = None  # if not None, the chunk goes to the worker owning this route, see Pool.map_by_key()
+    profile: bool = False
 
 
 @dataclass
 class ResultPacket:
     id: int
     result: any
+    func_missing: bool = False
+    job: int = 0
+    attempt: int = 0
+    timings: ChunkTimings | None = None
+    part: int = 0
+    final: bool = True  # whether this is the last part of the chunk; only the last one carries the timings
+    profile: Dict | None = None  # the raw cProfile stats of executing the part, if the chunk was profiled
 
     def holds_error(self) -> bool:
         return isinstance(self.result, Exception)
+
+
+@dataclass
+class ReadyPacket:
+    """
+    Sent by a worker once it connects, announcing how many chunks it executes concurrently (processes)
+    and how many more it is willing to queue locally (prefetch). The name identifies the worker across reconnects.
+    """
+    processes: int
+    prefetch: int = 0
+    name: str = ""
+
+
+@dataclass
+class HeartbeatPacket:
+    """
+    Sent by a worker periodically, such that the orchestrator notices workers that left without saying so.
+    Repeats the announcement of the ReadyPacket, so that a worker the orchestrator dropped in the meantime re-registers.
+    """
+    processes: int
+    prefetch: int = 0
+    name: str = ""
+
+
+@dataclass
+class CreditPacket:
+    """
+    Sent by a worker whenever it is done with chunks, granting the orchestrator credits to send that many new chunks.
+    """
+    credits: int = 1
+
+
+@dataclass
+class StealPacket:
+    """
+    Sent by the orchestrator to ask a worker to hand back up to count queued chunks it has not started yet.
+    """
+    count: int = 1
+
+
+@dataclass
+class ReturnPacket:
+    """
+    Sent by a worker in response to a StealPacket, holding the chunks it handed back (possibly none).
+    """
+    work: List[DataPacket]
+
+
+@dataclass
+class CancelPacket:
+    """
+    Sent by the orchestrator once a job was closed, e.g. because its caller was cancelled,
+    asking a worker to drop the queued chunks of that job it has not started yet.
+    """
+    job: int
+
+
+@dataclass
+class ObjectPacket:
+    """
+    Sent by the orchestrator ahead of the first chunk a worker receives that refers to a stored object (see Pool.put()),
+    holding the pickled frames of the object.
+    """
+    key: str
+    frames: List[Any]
@@ -1,74 +1,333 @@
-import inspect
+import dataclasses
 import os
+import pstats
 import threading
-from typing import Tuple, Callable, List, Any, Iterable, Literal
+from collections import deque
+from typing import Any, Callable, Dict, List, Iterable, Iterator, Literal, Deque, Set
+from distripool.batching import _ApplyBatcher
+from distripool.cache import ResultCache, _CachedMap
+from distripool.chunking import _FixedChunker, _AdaptiveChunker, _SliceChunker, _KeyedChunker
+from distripool.job import _Job
+from distripool.objects import ObjectRef
 from distripool.orchestrator import _Orchestrator, default_orchestrator
-from distripool.packet import DataPacket
-from distripool.worker import make_worker
+from distripool.packet import ResultPacket
+from distripool.spill import _ResultWriter, _result_sink
+from distripool.registry import _describe_function
+from distripool.stats import SpeculationStats, ChunkTimings, JobStats, PoolStats, _RawProfile, _merge_profile
 from distripool.asyncwrap import _AsyncResult
 
 
-class Pool:
+def _reorder(results: List, order: List[int]) -> List:
+    """
+    Put the results of map_by_key() back into the order of its iterable, given the index of each result.
+    """
+    ordered = [None] * len(order)
+    for i, result in zip(order, results):
+        ordered[i] = result
+    return ordered
+
+
+def _concatenate(parts: List) -> Any:
+    """
+    Concatenate the results of the chunks of map_batches(): NumPy arrays into one array,
+    bytes-like objects into bytes and any other sequences into a list.
+    """
+    if parts and all(type(part).__name__ == "ndarray" for part in parts):
+        import numpy
+        return numpy.concatenate(parts)
+    if parts and all(isinstance(part, (bytes, bytearray, memoryview)) for part in parts):
+        return b"".join(parts)
+    return [result for part in parts for result in part]
+
+
+class _PoolBase:
     def __init__(self, processes: int = None,
                  initializer=None,
                  initargs=(),
                  maxtasksperchild=None,
                  context=None,
-                 orchestrator: _Orchestrator | None = None):
+                 orchestrator: _Orchestrator | None = None,
+                 target_chunk_duration: float = 0.1,
+                 speculative: bool = False,
+                 speculation_factor: float = 3.0,
+                 chunk_callback: Callable[[ChunkTimings], None] | None = None,
+                 job_callback: Callable[[JobStats], None] | None = None,
+                 apply_batch_size: int | None = None,
+                 apply_linger: float = 0.005,
+                 stream_size: int | None = None,
+                 result_cache: ResultCache | None = None,
+                 priority: int = 0,
+                 weight: float = 1.0,
+                 profile: bool = False):
         """
         A distributed process pool object which controls a pool of distributed workers to which jobs can be submitted.
         It supports asynchronous results with timeouts and callbacks and has a parallel map implementation.
+        See AsyncPool for a variant whose methods are coroutines of an asyncio event loop.
 
         Note that the methods of the pool object should only be called by the process which created the pool.
 
-        :param processes: is the number of worker processes to use. If processes is None then the number returned by os.cpu_count() is used.
+        :param processes: is the number of worker processes to size chunks and windows for. If processes is None,
+        the total number of processes of the worker nodes currently connected to the orchestrator is used,
+        such that the pool adapts as worker nodes join or leave (os.cpu_count() while none are connected).
+        If a job has fewer chunks than the cluster has processes, e.g. with processes=4, its chunks are split into parts
+        that the worker nodes run on their idle processes side by side.
         :param initializer: If initializer is not None then each worker process will call initializer(*initargs) when it starts.
         :param initargs: Args for initializer
         :param maxtasksperchild: is the number of tasks a worker process can complete before it will exit and be replaced with a fresh worker process,
         to enable unused resources to be freed. The default maxtasksperchild is None, which means worker processes will live as long as the pool.
         :param context: NOT IMPLEMENTED.
         :param orchestrator: The orchestrator this pool should use. Defaults to default_orchestrator().
-        If you do not want to use multiple clusters of worker nodes and/or use several Pools in parallel,
-        defaul_orchestrator() is a sensible default. An orchestrator can only be used by one Pool at a time.
+        If you do not want to use multiple clusters of worker nodes, defaul_orchestrator() is a sensible default.
+        Several Pools may share an orchestrator; their chunks are interleaved according to priority and weight.
+        :param target_chunk_duration: The time in seconds a chunk should take on a worker if chunksize='adaptive' is passed
+        to any of the map methods.
+        :param speculative: If set, chunks at the tail of a job that have been outstanding for more than speculation_factor
+        times the median chunk round trip are re-dispatched to other workers. Whichever copy finishes first is used.
+        See speculation_stats().
+        :param speculation_factor: See speculative.
+        :param chunk_callback: If not None, called with the ChunkTimings of every finished chunk, e.g. to export them
+        to a metrics system. Should complete immediately, as it is called by the thread consuming the results.
+        :param job_callback: If not None, called with the JobStats of every finished job. See chunk_callback.
+        :param apply_batch_size: If not None, apply_async() calls are coalesced: calls of the same function are buffered
+        until apply_batch_size of them are pending or the oldest one waited for apply_linger seconds,
+        and are then shipped as a single chunk. Speeds up many small calls at the cost of up to apply_linger latency.
+        Batched calls are not speculated.
+        :param apply_linger: See apply_batch_size.
+        :param stream_size: If not None, chunks are executed in parts of stream_size items and workers send back
+        the results of each part as soon as it is done, rather than those of the whole chunk at once.
+        Lets imap() yield the first results of large chunks sooner and bounds the results a worker holds,
+        at the cost of a message per part. Does not apply to map_batches().
+        :param result_cache: If not None, the results of map() and starmap() (and thus apply()) are looked up in and
+        stored to this ResultCache, and only the elements without a cached result are dispatched.
+        :param priority: Among the Pools sharing an orchestrator, the chunks of Pools with a higher priority
+        are always dispatched first, e.g. to keep interactive jobs from waiting behind a large backfill.
+        Chunks that a worker node has already received are not pre-empted.
+        :param weight: Pools of the same priority get chunks dispatched in proportion to their weights.
+        :param profile: If set, worker nodes execute the chunks under cProfile and the profiles are merged
+        per function across the cluster, see profile_stats(). Slows down functions making many small calls.
         """
-        self._processes = processes if processes is not None else os.cpu_count()
+        self._processes = processes
         self._initializer = initializer
         self._initargs = initargs
         self._maxtasksperchild=maxtasksperchild
+        self._target_chunk_duration = target_chunk_duration
+        self._stream_size = max(1, stream_size) if stream_size is not None else None
+        self._result_cache = result_cache
+        self._speculative = speculative
+        self._speculation_factor = speculation_factor
+        self._chunk_callback = chunk_callback
+        self._job_callback = job_callback
+        self._stats = PoolStats()
+        self._recent_jobs: Deque[JobStats] = deque(maxlen=100)
+        self._stats_lock = threading.Lock()
+        self._profile = profile
+        self._profiles: Dict[str, pstats.Stats] = {}
 
         self.orchestrator = orchestrator if orchestrator is not None else default_orchestrator()
 
         self._terminated = False
         self._closed = False
         self._asyncs = []
+        self._open_jobs: Set[int] = set()  # the ids of the jobs of this pool not closed yet, see terminate()
+        self._objects: Set[str] = set()
+        self._stored_objects = False  # whether chunks have to be scanned for ObjectRefs
+        self._batcher = _ApplyBatcher(self, apply_batch_size, apply_linger) if apply_batch_size is not None else None
+
+        self._share = self.orchestrator._acquire(priority, weight)
+        self.orchestrator._local_worker()
+
+    def _capacity(self) -> int:
+        if self._processes is not None:
+            return self._processes
+        return self.orchestrator.capacity() or os.cpu_count()
+
+    def _chunker(self, iterable: Iterable, chunksize: int | Literal['adaptive']) -> _FixedChunker:
+        if chunksize == 'adaptive':
+            return _AdaptiveChunker(iterable, self._capacity(), self._target_chunk_duration)
+        return _FixedChunker(iterable, chunksize)
+
+    def _record_chunk(self, timings: ChunkTimings):
+        if self._chunk_callback is not None:
+            self._chunk_callback(timings)
+
+    def _record_profile(self, func_hash: str, stats: Dict):
+        with self._stats_lock:
+            self._profiles[func_hash] = _merge_profile(self._profiles.get(func_hash), stats)
+
+    def _record_job(self, job: JobStats, speculation: SpeculationStats | None):
+        with self._stats_lock:
+            self._recent_jobs.append(job)
+            self._stats.chunks += job.chunks
+            self._stats.items += job.items
+            self._stats.busy_time += job.duration
+            self._stats.bytes_sent += job.bytes_sent
+            self._stats.bytes_received += job.bytes_received
+            self._stats.function_hits += job.function_hits
+            self._stats.function_misses += job.function_misses
+            if speculation is not None:
+                self._stats.speculation.speculated += speculation.speculated
+                self._stats.speculation.won += speculation.won
+                self._stats.speculation.time_saved += speculation.time_saved
+        if self._job_callback is not None:
+            self._job_callback(job)
+
+    def stats(self) -> PoolStats:
+        """
+        Return the timings of this pool aggregated over all its jobs, including the stats of the most recent jobs:
+        throughput, queueing delay on the orchestrator, network time, time spent on the worker nodes
+        and the utilization of each worker node. See PoolStats and JobStats.
+        """
+        with self._stats_lock:
+            stats = dataclasses.replace(self._stats, jobs=list(self._recent_jobs),
+                                        speculation=dataclasses.replace(self._stats.speculation))
+        stats.throughput = stats.items / stats.busy_time if stats.busy_time > 0 else 0.0
+        return stats
 
-        self.orchestrator._acquire()
+    def speculation_stats(self) -> SpeculationStats:
+        """
+        Return how many chunks this pool re-dispatched speculatively, how many of the copies finished first
+        and (a lower bound of) how much time they saved. Only counts if the pool was created with speculative=True.
+        """
+        return self.stats().speculation
 
-        lo = self.orchestrator.listen_on
-        self._worker = make_worker((f"127.0.0.1{lo[0][lo[0].rfind(':'):]}", f"127.0.0.1{lo[1][lo[1].rfind(':'):]}"), start=False)
-        threading.Thread(target=self._worker.start).start()
+    def profile_stats(self, func: Callable) -> pstats.Stats | None:
+        """
+        Return the profile of func merged over all chunks of it this pool executed across the worker nodes,
+        or None if there is none. Only available if the pool was created with profile=True.
+        The distributed function appears under the file name <distripool:name of func>. For example:
 
-    def _map(self, func, iterable, chunksize, mapping_type: Literal['map', 'starmap'] = 'map'):
+        pool.profile_stats(func).sort_stats("cumulative").print_stats(10)
+        """
+        func_hash, _ = _describe_function(func)
+        with self._stats_lock:
+            merged = self._profiles.get(func_hash)
+            # a copy, such that e.g. strip_dirs() does not affect the profile this pool keeps merging into.
+            return pstats.Stats(_RawProfile(dict(merged.stats))) if merged is not None else None
+
+    def put(self, obj) -> ObjectRef:
+        """
+        Store a (large, read-only) object in the cluster and return a lightweight handle to it.
+        Pass the handle instead of the object as an argument to any of the methods of the pool:
+        the object is shipped to each worker node once and cached there under its content hash,
+        instead of being pickled and sent again with every chunk. See ObjectRef.
+
+        The object is pickled right away; changing it afterward does not affect the stored copy.
+        It is kept until delete() is called or the pool is terminated.
+        """
+        ref = self.orchestrator._put_object(obj, id(self))
+        self._objects.add(ref.key)
+        self._stored_objects = True
+        return ref
+
+    def delete(self, ref: ObjectRef):
+        """
+        Remove an object stored with put(). Worker nodes evict their copies once they need the space.
+        """
+        self._objects.discard(ref.key)
+        self.orchestrator._drop_object(ref.key, id(self))
+
+    def _open_job(self, func, chunks: _FixedChunker, mapping_type: Literal['map', 'starmap', 'apply'] = 'map',
+                  window: int | Callable[[], int] | None = None, ordered: bool = True,
+                  sink: Callable[[ResultPacket | None], None] | None = None, part_size: int | None = None) -> _Job:
         if self._closed:
             raise ValueError("Pool not running")
+        return _Job(self, func, chunks, mapping_type, window, ordered, sink, part_size)
+
+    def _part_size(self, chunk_size: int | Literal['adaptive'], chunks: int) -> int | None:
+        """
+        :return: The size of the parts to split chunks of chunk_size items into, such that a job with fewer chunks
+        in flight than the cluster has processes (e.g. processes=4 or a large chunksize) still keeps them all busy:
+        a worker node runs the parts of a chunk on its idle processes. None if chunks need not be split.
+        """
+        if chunk_size == 'adaptive':
+            return None
+        parts = -(-self.orchestrator.capacity() // max(1, chunks))
+        return -(-chunk_size // parts) if parts > 1 and chunk_size > 1 else None
+
+    def _map_job(self, func, iterable, chunksize, mapping_type: Literal['map', 'starmap'] = 'map',
+                 sink: Callable[[ResultPacket | None], None] | None = None) -> _Job:
+        chunk_size = max(1, len(iterable) // self._capacity()) if chunksize is None else chunksize
+        # adaptive chunks need feedback from finished chunks, hence they cannot all be dispatched up front.
+        window = (lambda: 2 * self._capacity()) if chunk_size == 'adaptive' else None
+        part_size = self._part_size(chunk_size, -(-len(iterable) // chunk_size) if chunk_size != 'adaptive' else 0)
+        return self._open_job(func, self._chunker(iterable, chunk_size), mapping_type, window, sink=sink,
+                              part_size=part_size)
+
+    def _batches_job(self, func, data, batch_size: int | None,
+                     sink: Callable[[ResultPacket | None], None] | None = None) -> _Job:
+        batch_size = max(1, len(data) // self._capacity()) if batch_size is None else batch_size
+        return self._open_job(func, _SliceChunker(data, batch_size), 'batch', sink=sink)
+
+    def _keyed_chunker(self, iterable, key: Callable | None, chunksize: int | None) -> _KeyedChunker:
+        return _KeyedChunker(iterable, key if key is not None else (lambda item: item), chunksize,
+                             self._capacity(), self.orchestrator._owner)
+
+    def _imap_job(self, func, iterable, chunksize, parallel_calls, mapping_type: Literal['map', 'starmap'] = 'map',
+                  ordered: bool = True, sink: Callable[[ResultPacket | None], None] | None = None) -> _Job:
+        window = self._capacity if parallel_calls is None else max(1, parallel_calls)
+        part_size = self._part_size(chunksize, window() if callable(window) else window)
+        return self._open_job(func, self._chunker(iterable, chunksize), mapping_type, window, ordered, sink, part_size)
+
+    def close(self):
+        """
+        Prevents any more tasks from being submitted to the pool. Once all the tasks have been completed the worker processes will exit.
+        """
+        if self._batcher is not None:
+            self._batcher.close()
+        self._closed = True
 
-        chunk_size = max(1, len(iterable) // self._processes) if chunksize is None else chunksize
-        chunks = [iterable[i:i + chunk_size] for i in range(0, len(iterable), chunk_size)]
-        for chunk_id, chunk in enumerate(chunks):
-            self.orchestrator._send_work(DataPacket(chunk_id, inspect.getsource(func), func.__name__, chunk, mapping_type,
-                                                    self._initializer, self._initargs, self._maxtasksperchild))
+    def terminate(self):
+        """
+        Stops the worker processes immediately without completing outstanding work:
+        the chunks of the pool that were not dispatched yet are dropped, workers drop those they have not started yet,
+        and calls still waiting for results raise a RuntimeError.
+        When the pool object is garbage collected terminate() will be called immediately.
+        """
+        if self._terminated:
+            return
+        self._closed = True
+        if self._batcher is not None:
+            self._batcher.close()
+        for job in list(self._open_jobs):
+            self.orchestrator._close_job(job, notify=True)
+        for key in self._objects:
+            self.orchestrator._drop_object(key, id(self))
+        self._objects.clear()
+        self.orchestrator._release(self._share)
+        self._terminated = True
 
-        unordered_results: List[Tuple[int, List[any, ...]]] = []
-        for _ in chunks:
-            result = self.orchestrator._receive_result()
-            if result.holds_error():
-                raise result.result
-            unordered_results.append((result.id, result.result))
 
-        sorted_results = sorted(unordered_results, key=lambda x: x[0])
-        flattened_results = [result for chunked_results in sorted_results for result in chunked_results[1]]
+class Pool(_PoolBase):
+    def _stream(self, job: _Job) -> Iterator[List]:
+        """
+        Run the given job to completion, blocking for its results, and yield the result list of each chunk
+        as soon as it is available. See _Job.
+        """
+        try:
+            job.fill()
+            while not job.done:
+                yield from job.handle(self.orchestrator._receive_result(job.id, job.timeout()))
+                job.fill()
+        finally:
+            # drops the remaining chunks and results of this job, e.g. if the caller abandoned the iterator.
+            job.close()
 
-        return flattened_results
+    def _map(self, func, iterable, chunksize, mapping_type: Literal['map', 'starmap'] = 'map'):
+        if self._result_cache is not None:
+            cached = _CachedMap(self._result_cache, func, list(iterable), mapping_type)
+            return cached.merge(self._map_uncached(func, cached.misses, chunksize, mapping_type)
+                                if cached.misses else [])
+        return self._map_uncached(func, iterable, chunksize, mapping_type)
+
+    def _map_uncached(self, func, iterable, chunksize, mapping_type: Literal['map', 'starmap'] = 'map'):
+        return [result for chunk_results in self._stream(self._map_job(func, iterable, chunksize, mapping_type))
+                for result in chunk_results]
+
+    def _imap(self, func, iterable, chunksize, parallel_calls, mapping_type: Literal['map', 'starmap'] = 'map',
+              ordered: bool = True):
+        job = self._imap_job(func, iterable, chunksize, parallel_calls, mapping_type, ordered)
+        for chunk_results in self._stream(job):
+            yield from chunk_results
 
     def _asynchronize(self, pool, target, args, callback, error_callback) -> _AsyncResult:
         async_result = _AsyncResult(pool, target, args, callback, error_callback)
@@ -97,8 +356,19 @@ class Pool:
         If the target function fails, then the error_callback is called with the exception instance.
 
         Callbacks should complete immediately since otherwise the thread which handles the results will get blocked.
+
+        If the pool was created with apply_batch_size, the call is shipped together with other calls of func,
+        see Pool.
         """
-        return self._asynchronize(self, self.apply, (func, args, kwds), callback, error_callback)
+        if self._batcher is None:
+            return self._asynchronize(self, self.apply, (func, args, kwds), callback, error_callback)
+        if self._closed:
+            raise ValueError("Pool not running")
+        if not isinstance(args, Iterable):
+            raise TypeError(f"args must be an Iterable, was {type(args)}")
+        async_result = self._batcher.submit(func, tuple(args), dict(kwds), callback, error_callback)
+        self._asyncs.append(async_result)
+        return async_result
 
     def map(self, func: Callable, iterable: List, chunksize: int = None) -> List:
         """
@@ -107,12 +377,45 @@ class Pool:
 
         This method chops the iterable into a number of chunks which it submits to the process pool as separate tasks.
         The (approximate) size of these chunks can be specified by setting chunksize to a positive integer.
+        If chunksize is 'adaptive', chunks start small and are resized based on the measured per-item cost,
+        such that each takes about target_chunk_duration (see Pool), tapering off towards the end of the job.
+        Chunks larger than len(iterable) divided by the number of processes of the cluster are split into parts
+        that the worker node runs on its idle processes side by side, so a large chunksize does not leave them idle.
 
         Note that it may cause high memory usage for very long iterables.
         Consider using imap() or imap_unordered() with explicit chunksize option for better efficiency.
         """
         return self._map(func, iterable, chunksize, 'map')
 
+    def map_batches(self, func: Callable, data, batch_size: int = None):
+        """
+        A vectorized variant of map(): func is called once per chunk of up to batch_size elements of data,
+        rather than once per element, and must return a sequence of results for it, e.g. a NumPy function.
+        The results of all chunks are concatenated, into one array if func returns NumPy arrays,
+        into bytes if it returns bytes-like objects and into a list otherwise. It blocks until the result is ready.
+
+        If data supports slicing (lists, NumPy arrays, memoryviews, ...), func receives slices of it.
+        Slices of NumPy arrays and memoryviews are views, which are sent without copying them;
+        func receives memoryview slices as a bytes-like object. Other iterables are split into lists.
+        By default, data is split into one chunk per process.
+        """
+        return _concatenate(list(self._stream(self._batches_job(func, data, batch_size))))
+
+    def map_by_key(self, func: Callable, iterable: Iterable, key: Callable | None = None, chunksize: int = None) -> List:
+        """
+        Like map(), except that all elements with the same key(element) (the element itself if key is None)
+        are sent to the same worker node, e.g. so that per-key state a function keeps in module globals,
+        like loaded models, is only built and cached on one worker node. It blocks until the result is ready.
+
+        Keys are spread over the worker nodes in proportion to their processes by rendezvous hashing:
+        when a worker node joins or leaves, only the keys it gains or loses move to another node.
+        Keys must be picklable; they are hashed in their pickled form. Chunks held back for a busy worker node
+        are only handed to another node by work stealing and speculation.
+        """
+        chunks = self._keyed_chunker(iterable, key, chunksize)
+        results = [result for chunk_results in self._stream(self._open_job(func, chunks)) for result in chunk_results]
+        return _reorder(results, chunks.order)
+
     def map_async(self, func, iterable, chunksize=None, callback=None, error_callback=None) -> _AsyncResult:
         """
         A variant of the map() method which returns a AsyncResult object.
@@ -128,31 +431,52 @@ class Pool:
         """
         return self._asynchronize(self, self.map, (func, iterable, chunksize), callback, error_callback)
 
-    def imap(self, func, iterable, chunksize=1, parallel_calls=2):
+    def imap(self, func, iterable, chunksize=1, parallel_calls=None):
         """
-        A lazier version of map().
+        A lazier version of map(). The iterable may be any iterable, including generators, and is consumed lazily.
+        Results are yielded in order as soon as they are available.
 
-        The chunksize argument is the same as the one used by the map() method.
+        The chunksize argument is the same as the one used by the map() method, including 'adaptive'.
         For very long iterables using a large value for chunksize can make the job complete much faster than using the default value of 1.
 
-        The parallel_calls argument indicates how many chunks should be produced at a time for worker nodes to process.
+        The parallel_calls argument indicates how many chunks may be in flight on the worker nodes at a time.
+        Defaults to the number of processes of this pool.
         """
-        parallel_chunk_size = chunksize * parallel_calls
-        parallel_chunks = [iterable[i:i + parallel_chunk_size] for i in range(0, len(iterable), parallel_chunk_size)]
+        return self._imap(func, iterable, chunksize, parallel_calls, 'map', ordered=True)
 
-        for parallel_chunk in parallel_chunks:
-            chunk_result = self._map(func, parallel_chunk, chunksize=chunksize)
-            for result in chunk_result:
-                yield result
+    def map_to(self, func: Callable, iterable: Iterable, sink: Callable[[Any], None] | str | os.PathLike,
+               chunksize: int | Literal['adaptive'] = 'adaptive', parallel_calls: int = None) -> int:
+        """
+        A variant of map() for outputs that do not fit into memory: rather than collecting the results in a list,
+        they are passed to sink in order as the chunks arrive. It blocks until all results were passed on.
+
+        sink is either a callable, which is called with each result, or the path of a file the results are written to,
+        which can be read back lazily with read_results(). The iterable is consumed lazily like by imap(),
+        so the memory used on the orchestrator is bounded by the parallel_calls chunks in flight
+        (by default, the number of processes of this pool) rather than by the size of the input or output.
 
-    def imap_unordered(self, func, iterable, chunksize=1, parallel_calls=2):
+        :return: The number of results.
         """
-        The same as imap() except that the ordering of the results from the returned iterator should be considered arbitrary.
+        write = _result_sink(sink)
+        count = 0
+        stream = self._stream(self._imap_job(func, iterable, chunksize, parallel_calls))
+        try:
+            for chunk_results in stream:
+                for result in chunk_results:
+                    write(result)
+                count += len(chunk_results)
+        finally:
+            stream.close()
+            if isinstance(write, _ResultWriter):
+                write.close()
+        return count
+
+    def imap_unordered(self, func, iterable, chunksize=1, parallel_calls=None):
+        """
+        The same as imap() except that the results are yielded in the order in which the chunks complete.
         (Only when there is only one worker process is the order guaranteed to be “correct”.)
-
-        Currently, this method merely calls self.imap(). However, expect this behavior to change in the future.
         """
-        return self.imap(func, iterable, chunksize, parallel_calls)
+        return self._imap(func, iterable, chunksize, parallel_calls, 'map', ordered=False)
 
     def starmap(self, func, iterable, chunksize=None):
         """
@@ -167,21 +491,6 @@ class Pool:
         """
         return self._asynchronize(self, self.starmap, (func, iterable, chunksize), callback, error_callback)
 
-    def close(self):
-        """
-        Prevents any more tasks from being submitted to the pool. Once all the tasks have been completed the worker processes will exit.
-        """
-        self._closed = True
-
-    def terminate(self):
-        """
-        Stops the worker processes immediately without completing outstanding work.
-        When the pool object is garbage collected terminate() will be called immediately.
-        """
-        self._worker.close()
-        self.orchestrator._release()
-        self._terminated = True
-
     def join(self):
         """
         Wait for the worker processes to exit. One must call close() or terminate() before using join().
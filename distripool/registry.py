@@ -0,0 +1,53 @@
+import functools
+import hashlib
+import inspect
+from collections import OrderedDict
+from typing import Callable, Tuple
+
+
+def _source_hash(f: str) -> str:
+    return hashlib.sha256(f.encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=256)
+def _describe_code(code) -> Tuple[str, str]:
+    source = inspect.getsource(code)
+    return _source_hash(source), source
+
+
+def _describe_function(func: Callable) -> Tuple[str, str]:
+    """
+    :return: A tuple of the content hash and the source code of func. Cached per code object,
+    so repeated calls for the same function do not re-read its source.
+    """
+    return _describe_code(func.__code__)
+
+
+class _FunctionRegistry:
+    def __init__(self, maxsize: int = 256):
+        """
+        A bounded, content-addressed store of function sources kept by a worker node.
+        Sources are looked up by their hash, so the orchestrator only has to ship a function's body once per worker.
+
+        :param maxsize: The maximum number of sources to keep before evicting the least recently used one.
+        """
+        self.maxsize = maxsize
+        self._sources: OrderedDict[str, str] = OrderedDict()
+
+    def __contains__(self, f_hash: str) -> bool:
+        return f_hash in self._sources
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def get(self, f_hash: str) -> str | None:
+        source = self._sources.get(f_hash)
+        if source is not None:
+            self._sources.move_to_end(f_hash)
+        return source
+
+    def put(self, f_hash: str, source: str):
+        self._sources[f_hash] = source
+        self._sources.move_to_end(f_hash)
+        if len(self._sources) > self.maxsize:
+            self._sources.popitem(last=False)
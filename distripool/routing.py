@@ -0,0 +1,47 @@
+import hashlib
+import math
+import pickle
+from typing import Dict, Hashable, Iterable, Tuple
+
+
+def _route(key: Hashable) -> int:
+    """
+    :return: A 64-bit hash of key that, unlike hash(), is the same in every process.
+    """
+    return int.from_bytes(hashlib.blake2b(pickle.dumps(key, protocol=4), digest_size=8).digest(), "little")
+
+
+class _Ring:
+    def __init__(self, members: Iterable[Tuple[str, int, bytes]] = ()):
+        """
+        Assign routes to workers by weighted rendezvous hashing: every route goes to the worker with the highest score
+        weight / -ln(h), where h is a hash of the route and the worker's name in (0, 1).
+        Each worker gets a share of the routes proportional to its weight, and when a worker joins or leaves,
+        only the routes it gains or loses move, so the other workers keep theirs.
+
+        :param members: Tuples of the name (stable across reconnects), the weight (e.g. its number of processes)
+        and the identity of each worker.
+        """
+        self._members = [(name.encode(), weight, identity) for name, weight, identity in members if weight > 0]
+        self._owners: Dict[int, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    @staticmethod
+    def _score(name: bytes, weight: int, route: int) -> float:
+        digest = hashlib.blake2b(route.to_bytes(8, "little"), digest_size=8, key=name[:64]).digest()
+        h = (int.from_bytes(digest, "little") + 0.5) / 2 ** 64
+        return weight / -math.log(h)
+
+    def owner(self, route: int) -> bytes | None:
+        """
+        :return: The identity of the worker owning route, or None if there are no workers.
+        """
+        owner = self._owners.get(route)
+        if owner is None and self._members:
+            owner = max(self._members, key=lambda member: self._score(member[0], member[1], route))[2]
+            if len(self._owners) >= 1 << 16:
+                self._owners.clear()
+            self._owners[route] = owner
+        return owner
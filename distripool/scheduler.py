@@ -0,0 +1,102 @@
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Iterable, List, Tuple
+
+from distripool.packet import DataPacket
+
+_Item = Tuple[DataPacket, bool]
+
+
+@dataclass
+class _Share:
+    priority: int = 0
+    weight: float = 1.0
+    passed: float = 0.0  # the virtual time: the chunks dispatched so far divided by the weight
+    queue: Deque[_Item] = field(default_factory=deque)
+
+
+class _Scheduler:
+    def __init__(self):
+        """
+        The queue of work of an orchestrator, split into shares (one per Pool) that are served by priority and weight:
+        shares of a higher priority always go first, and shares of the same priority get chunks dispatched
+        in proportion to their weights (stride scheduling). Within a share, work is dispatched in order.
+
+        A share that runs dry and refills does not get to catch up on the chunks it missed while it had none queued.
+        Work of jobs that are not assigned to a share goes to a default share of priority 0 and weight 1.
+        Closing a share drops the work still queued in it, e.g. of a Pool that was terminated.
+        """
+        self._shares: Dict[int | None, _Share] = {None: _Share()}
+        self._jobs: Dict[int, int] = {}
+        self._share_ids = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(len(share.queue) for share in self._shares.values())
+
+    def open_share(self, priority: int = 0, weight: float = 1.0) -> int:
+        if weight <= 0:
+            raise ValueError(f"weight must be positive, was {weight}")
+        share = next(self._share_ids)
+        self._shares[share] = _Share(priority, weight)
+        return share
+
+    def close_share(self, share: int):
+        if self._shares.pop(share, None) is not None:
+            self._jobs = {job: s for job, s in self._jobs.items() if s != share}
+
+    def assign(self, job: int, share: int | None):
+        if share is not None and share in self._shares:
+            self._jobs[job] = share
+
+    def _share_of(self, work: DataPacket) -> _Share:
+        return self._shares.get(self._jobs.get(work.job), self._shares[None])
+
+    def _activate(self, share: _Share):
+        active = [s.passed for s in self._shares.values() if s.queue and s.priority == share.priority]
+        if active:
+            share.passed = max(share.passed, min(active))
+
+    def append(self, item: _Item):
+        share = self._share_of(item[0])
+        if not share.queue:
+            self._activate(share)
+        share.queue.append(item)
+
+    def requeue(self, items: Iterable[_Item]):
+        """
+        Put items back at the front of their shares, e.g. the chunks of a worker that left, keeping their order.
+        """
+        for item in reversed(list(items)):
+            share = self._share_of(item[0])
+            if not share.queue:
+                self._activate(share)
+            share.queue.appendleft(item)
+
+    def remove(self, predicate: Callable[[DataPacket], bool]):
+        for share in self._shares.values():
+            if any(predicate(work) for work, _ in share.queue):
+                share.queue = deque(item for item in share.queue if not predicate(item[0]))
+
+    def forget(self, job: int):
+        """
+        Drop the queued work of the given job and its assignment.
+        """
+        self.remove(lambda work: work.job == job)
+        self._jobs.pop(job, None)
+
+    def _by_precedence(self) -> List[_Share]:
+        shares = [share for share in self._shares.values() if share.queue]
+        return sorted(shares, key=lambda share: (-share.priority, share.passed))
+
+    def pop(self, eligible: Callable[[DataPacket], bool]) -> _Item | None:
+        """
+        :return: The next eligible item by precedence of its share, or None if none is eligible.
+        """
+        for share in self._by_precedence():
+            for i, item in enumerate(share.queue):
+                if eligible(item[0]):
+                    del share.queue[i]
+                    share.passed += 1 / share.weight
+                    return item
+        return None
@@ -0,0 +1,76 @@
+import statistics
+import time
+from typing import Dict, List
+
+from distripool.stats import SpeculationStats
+
+
+class _Speculator:
+    def __init__(self, factor: float = 3.0):
+        """
+        Decide which in-flight chunks of a job are stragglers worth re-dispatching and account for the outcome.
+        A chunk is a straggler once it has been outstanding for more than factor times the median round trip
+        of the chunks of the same job that finished already. Every chunk is speculated at most once.
+        """
+        self.factor = factor
+        self.stats = SpeculationStats()
+        self._durations: List[float] = []
+        self._speculated: Dict[int, float] = {}
+        self._won: Dict[int, float] = {}
+
+    def _deadline(self, sent_at: float) -> float | None:
+        if not self._durations:
+            return None
+        return sent_at + self.factor * statistics.median(self._durations)
+
+    def timeout(self, sent_at: Dict[int, float]) -> float | None:
+        """
+        :return: The time in seconds until the next in-flight chunk becomes a straggler, or None if none can.
+        """
+        deadlines = [self._deadline(t) for chunk_id, t in sent_at.items() if chunk_id not in self._speculated]
+        deadlines = [d for d in deadlines if d is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.perf_counter())
+
+    def stragglers(self, sent_at: Dict[int, float]) -> List[int]:
+        """
+        :return: The ids of the in-flight chunks that are overdue and were not speculated yet. They are marked as speculated.
+        """
+        now = time.perf_counter()
+        overdue = [chunk_id for chunk_id, t in sent_at.items()
+                   if chunk_id not in self._speculated and (d := self._deadline(t)) is not None and d <= now]
+        for chunk_id in overdue:
+            self._speculated[chunk_id] = now
+        self.stats.speculated += len(overdue)
+        return overdue
+
+    def is_speculated(self, chunk_id: int) -> bool:
+        return chunk_id in self._speculated
+
+    def finished(self, chunk_id: int, attempt: int, roundtrip: float):
+        """
+        Record the first result of a chunk. Round trips of speculative copies do not count towards the median.
+        """
+        if attempt == 0:
+            self._durations.append(roundtrip)
+        elif chunk_id in self._speculated:
+            self.stats.won += 1
+            self._won[chunk_id] = time.perf_counter()
+
+    def duplicate(self, chunk_id: int):
+        """
+        Record the arrival of the slower copy of a chunk, which is dropped.
+        """
+        won_at = self._won.pop(chunk_id, None)
+        if won_at is not None:
+            self.stats.time_saved += time.perf_counter() - won_at
+
+    def close(self) -> SpeculationStats:
+        """
+        Account the copies whose original never finished until the end of the job and return the stats.
+        """
+        now = time.perf_counter()
+        self.stats.time_saved += sum(now - won_at for won_at in self._won.values())
+        self._won.clear()
+        return self.stats
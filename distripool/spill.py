@@ -0,0 +1,47 @@
+import mmap
+import os
+import pickle
+import struct
+from typing import Any, Callable, Iterator
+
+_LENGTH = struct.Struct("<Q")
+
+
+class _ResultWriter:
+    def __init__(self, path: str | os.PathLike):
+        """
+        Append results to a file, each pickled and prefixed with its length, such that read_results()
+        can load them one at a time without reading the whole file into memory.
+        """
+        self._file = open(path, "wb")
+        self.count = 0
+
+    def __call__(self, result: Any):
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_LENGTH.pack(len(data)))
+        self._file.write(data)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def _result_sink(sink: Callable[[Any], None] | str | os.PathLike) -> Callable[[Any], None]:
+    return _ResultWriter(sink) if isinstance(sink, (str, os.PathLike)) else sink
+
+
+def read_results(path: str | os.PathLike) -> Iterator[Any]:
+    """
+    Lazily load the results Pool.map_to() wrote to the file at path, in order.
+    The file is memory-mapped, so only the result being loaded has to fit into memory.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            offset = 0
+            while offset < len(view):
+                length, = _LENGTH.unpack_from(view, offset)
+                offset += _LENGTH.size
+                yield pickle.loads(view[offset:offset + length])
+                offset += length
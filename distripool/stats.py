@@ -0,0 +1,231 @@
+import pstats
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+@dataclass
+class SpeculationStats:
+    """
+    Counters of the speculative re-execution of straggler chunks.
+
+    :ivar speculated: The number of chunks that were re-dispatched.
+    :ivar won: The number of re-dispatched chunks whose speculative copy finished first.
+    :ivar time_saved: A lower bound of the time in seconds saved by the copies that won, i.e. the time between the copy
+    finishing and the original finishing (or the job ending, if the original never finished before that).
+    """
+    speculated: int = 0
+    won: int = 0
+    time_saved: float = 0.0
+
+
+@dataclass
+class CompressionStats:
+    """
+    Counters of the compression of the frames an orchestrator or worker node sent, and of the decompression
+    of the frames it received. Durations are in seconds.
+
+    :ivar frames: The number of frames sent compressed.
+    :ivar bytes_in: The size of those frames before compression.
+    :ivar bytes_out: The size of those frames after compression.
+    :ivar compress_time: The time spent compressing, including frames that turned out not to be worth it.
+    :ivar decompress_time: The time spent decompressing received frames.
+    """
+    frames: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    compress_time: float = 0.0
+    decompress_time: float = 0.0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+@dataclass
+class ChunkTimings:
+    """
+    The timing breakdown of a single chunk. Durations are in seconds, timestamps are seconds since the epoch.
+    Worker-side values are filled in by the worker node, orchestrator-side values by the orchestrator.
+    Worker and orchestrator timestamps are taken from different clocks and should not be compared with each other.
+
+    :ivar worker: The name of the worker node that executed the chunk.
+    :ivar processes: The number of processes of that worker node.
+    :ivar items: The number of elements in the chunk.
+    :ivar received: When the worker node received the chunk.
+    :ivar deserialize: The time it took the worker node to unpickle the chunk.
+    :ivar queued: The time the chunk waited on the worker node until it was dispatched to the worker's local pool.
+    :ivar execute: The time between dispatching the chunk to the local pool and its results being back on the worker node.
+    :ivar compute: The time the distributed function ran for the elements of the chunk, summed over the worker's processes.
+    :ivar serialize: The time it took the worker node to pickle the results.
+    :ivar submitted: When the Pool handed the chunk to the orchestrator.
+    :ivar sent: When the orchestrator sent the chunk to the worker node.
+    :ivar returned: When the orchestrator received the results.
+    :ivar load: The time it took the orchestrator to unpickle the results.
+    :ivar sent_bytes: The size of the chunk on the wire.
+    :ivar returned_bytes: The size of the results on the wire.
+    :ivar function_hits: How often the local process found the distributed function compiled already.
+    :ivar function_misses: How often the local process had to compile the distributed function.
+    """
+    worker: str = ""
+    processes: int = 1
+    items: int = 0
+    received: float = 0.0
+    deserialize: float = 0.0
+    queued: float = 0.0
+    execute: float = 0.0
+    compute: float = 0.0
+    serialize: float = 0.0
+    submitted: float = 0.0
+    sent: float = 0.0
+    returned: float = 0.0
+    load: float = 0.0
+    sent_bytes: int = 0
+    returned_bytes: int = 0
+    function_hits: int = 0
+    function_misses: int = 0
+
+    @property
+    def queueing_delay(self) -> float:
+        """
+        The time the chunk waited on the orchestrator for a worker with free capacity.
+        """
+        return max(0.0, self.sent - self.submitted)
+
+    @property
+    def worker_time(self) -> float:
+        """
+        The time the chunk spent on the worker node.
+        """
+        return self.deserialize + self.queued + self.execute + self.serialize
+
+    @property
+    def network_time(self) -> float:
+        """
+        The time the chunk and its results spent on the wire, i.e. the round trip minus the time spent on the worker node.
+        """
+        return max(0.0, self.returned - self.sent - self.worker_time)
+
+
+@dataclass
+class JobStats:
+    """
+    The aggregated timings of a single call of map, imap, starmap, apply etc. Durations are in seconds.
+
+    :ivar job: The id of the job on its orchestrator.
+    :ivar func_name: The name of the distributed function.
+    :ivar chunks: The number of chunks that finished.
+    :ivar items: The number of elements in those chunks.
+    :ivar duration: The wall time from the start of the job until its last chunk finished.
+    :ivar throughput: Elements per second.
+    :ivar queueing_delay: The mean time a chunk waited on the orchestrator for a worker with free capacity.
+    :ivar network_time: The mean time a chunk and its results spent on the wire.
+    :ivar worker_time: The mean time a chunk spent on a worker node.
+    :ivar utilization: Per worker node, the approximate share of its process time spent executing chunks of this job.
+    :ivar bytes_sent: The number of bytes sent to the worker nodes.
+    :ivar bytes_received: The number of bytes received from the worker nodes.
+    :ivar function_hits: The number of chunks whose local process found the function compiled already.
+    :ivar function_misses: The number of chunks whose local process had to compile the function.
+    """
+    job: int
+    func_name: str
+    chunks: int = 0
+    items: int = 0
+    duration: float = 0.0
+    throughput: float = 0.0
+    queueing_delay: float = 0.0
+    network_time: float = 0.0
+    worker_time: float = 0.0
+    utilization: Dict[str, float] = field(default_factory=dict)
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    function_hits: int = 0
+    function_misses: int = 0
+
+
+@dataclass
+class PoolStats:
+    """
+    The timings of a Pool aggregated over its jobs.
+
+    :ivar jobs: The stats of the most recently finished jobs, oldest first.
+    :ivar chunks: The number of chunks that finished across all jobs.
+    :ivar items: The number of elements in those chunks.
+    :ivar busy_time: The summed wall time of all jobs.
+    :ivar throughput: Elements per second of busy time.
+    :ivar bytes_sent: The number of bytes sent to the worker nodes.
+    :ivar bytes_received: The number of bytes received from the worker nodes.
+    :ivar function_hits: See JobStats.function_hits.
+    :ivar function_misses: See JobStats.function_misses.
+    :ivar speculation: See SpeculationStats.
+    """
+    jobs: List[JobStats] = field(default_factory=list)
+    chunks: int = 0
+    items: int = 0
+    busy_time: float = 0.0
+    throughput: float = 0.0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    function_hits: int = 0
+    function_misses: int = 0
+    speculation: SpeculationStats = field(default_factory=SpeculationStats)
+
+
+class _RawProfile:
+    def __init__(self, stats: Dict):
+        """
+        The raw stats of a cProfile.Profile, as shipped by the worker nodes, in the shape pstats.Stats loads from.
+        """
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _merge_profile(merged: pstats.Stats | None, stats: Dict) -> pstats.Stats:
+    """
+    Add the raw stats of a cProfile.Profile to merged (a new pstats.Stats if None).
+    """
+    if merged is None:
+        return pstats.Stats(_RawProfile(stats))
+    merged.add(_RawProfile(stats))
+    return merged
+
+
+class _JobRecorder:
+    def __init__(self, job: int, func_name: str):
+        """
+        Collect the ChunkTimings of a job and aggregate them into a JobStats once the job is done.
+        """
+        self.stats = JobStats(job, func_name)
+        self._started = time.perf_counter()
+        self._timings: List[ChunkTimings] = []
+
+    def add(self, timings: ChunkTimings):
+        self._timings.append(timings)
+
+    def finish(self) -> JobStats:
+        stats = self.stats
+        stats.duration = time.perf_counter() - self._started
+        stats.chunks = len(self._timings)
+        stats.items = sum(t.items for t in self._timings)
+        stats.bytes_sent = sum(t.sent_bytes for t in self._timings)
+        stats.bytes_received = sum(t.returned_bytes for t in self._timings)
+        stats.function_hits = sum(t.function_hits for t in self._timings)
+        stats.function_misses = sum(t.function_misses for t in self._timings)
+        stats.throughput = stats.items / stats.duration if stats.duration > 0 else 0.0
+        if self._timings:
+            stats.queueing_delay = statistics.fmean(t.queueing_delay for t in self._timings)
+            stats.network_time = statistics.fmean(t.network_time for t in self._timings)
+            stats.worker_time = statistics.fmean(t.worker_time for t in self._timings)
+
+        busy: Dict[str, float] = defaultdict(float)
+        processes: Dict[str, int] = {}
+        for t in self._timings:
+            busy[t.worker] += t.compute
+            processes[t.worker] = t.processes
+        if stats.duration > 0:
+            stats.utilization = {worker: min(1.0, busy[worker] / (stats.duration * processes[worker])) for worker in busy}
+        return stats
@@ -0,0 +1,116 @@
+import pickle
+import socket
+from typing import Any, List, Tuple
+
+import zmq
+
+from distripool.compression import _Compressor, _decompress
+from distripool.stats import CompressionStats
+
+
+class _Waker:
+    def __init__(self):
+        """
+        A self-pipe which lets other threads wake up a thread blocked in zmq.Poller.poll().
+        zmq sockets must not be shared across threads, so threads hand over work via queues and call wake() instead.
+        """
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+
+    def fileno(self) -> int:
+        return self._reader.fileno()
+
+    def wake(self):
+        try:
+            self._writer.send(b"\0")
+        except (BlockingIOError, OSError):  # already awake or closed
+            pass
+
+    def clear(self):
+        try:
+            while self._reader.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+
+def _dumps(obj) -> List[bytes | memoryview]:
+    """
+    Pickle obj with protocol 5. Buffers supporting out-of-band pickling (e.g. NumPy arrays) are not copied
+    into the pickle stream but returned as separate frames following the pickle stream itself.
+    """
+    buffers = []
+    stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    return [stream] + [buffer.raw() for buffer in buffers]
+
+
+def _loads(frames: List[zmq.Frame], stats: CompressionStats | None = None) -> Any:
+    """
+    Rebuild an object from the frames sent by _send_object: a compression header followed by the frames created by
+    _dumps. Out-of-band buffers are rebuilt directly on the received frames, unless they were compressed.
+    """
+    frames = _decompress(frames[0].buffer, [frame.buffer for frame in frames[1:]], stats)
+    return pickle.loads(frames[0], buffers=frames[1:])
+
+
+def _send_object(socket: zmq.Socket, obj, envelope: List[bytes] = (), flags: int = 0,
+                 compressor: _Compressor | None = None) -> int:
+    """
+    Send obj as a multipart message, prefixed by the envelope frames (e.g. a ROUTER identity).
+    Large frames are sent without copying them, or compressed if a compressor is given.
+
+    :return: The number of bytes sent, excluding the envelope.
+    """
+    frames = _dumps(obj)
+    header = b""
+    if compressor is not None:
+        header, frames = compressor.compress(frames, type(obj).__name__)
+    socket.send_multipart([*envelope, header, *frames], flags=flags, copy=False)
+    return len(header) + sum(memoryview(frame).nbytes for frame in frames)
+
+
+def _receive_object(socket: zmq.Socket, envelope: int = 0, flags: int = 0,
+                    stats: CompressionStats | None = None) -> Tuple[List[bytes], Any]:
+    """
+    Receive an object sent by _send_object.
+
+    :return: A tuple of the first envelope frames (e.g. a ROUTER identity) and the received object.
+    """
+    frames = socket.recv_multipart(flags=flags, copy=False)
+    return [frame.bytes for frame in frames[:envelope]], _loads(frames[envelope:], stats)
+
+
+class _Pickled:
+    def __init__(self, frames: List[bytes | memoryview]):
+        """
+        An object pickled ahead of time by _Pickled.dump, e.g. to measure how long pickling takes.
+        When a _Pickled is sent, its frames are passed on out-of-band, so they are not copied again.
+        """
+        self.frames = frames
+
+    @staticmethod
+    def dump(obj) -> "_Pickled":
+        return _Pickled(_dumps(obj))
+
+    def load(self) -> Any:
+        """
+        Read-only out-of-band buffers (e.g. received zmq frames) are copied first, so that the loaded objects,
+        e.g. NumPy arrays, are writable as they were before pickling.
+        """
+        buffers = [bytearray(frame) if memoryview(frame).readonly else frame for frame in self.frames[1:]]
+        return pickle.loads(self.frames[0], buffers=buffers)
+
+    def __reduce_ex__(self, protocol):
+        if protocol < 5:  # e.g. passed to a LocalPool subprocess, which pickles with the default protocol
+            # as bytearrays, so that load() need not copy them again to hand out writable buffers.
+            return _Pickled._rebuild, tuple(bytearray(frame) for frame in self.frames)
+        return _Pickled._rebuild, tuple(pickle.PickleBuffer(frame) for frame in self.frames)
+
+    @staticmethod
+    def _rebuild(*frames) -> "_Pickled":
+        return _Pickled(list(frames))
@@ -1,115 +1,460 @@
+import cProfile
+import dataclasses
+import functools
+import itertools
 import os
+import queue
+import socket
 import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple, deque
+from dataclasses import dataclass, field
 
 import zmq
-from typing import Tuple
-from multiprocessing import Pool as LocalPool
+from typing import Tuple, Callable, Deque, Any, Dict, Iterable
 
-from distripool.packet import DataPacket, ResultPacket
+from distripool.compression import Codec, _Compressor
+from distripool.packet import DataPacket, ResultPacket, ReadyPacket, CreditPacket, StealPacket, ReturnPacket, \
+    CancelPacket, ObjectPacket, HeartbeatPacket
+from distripool.localpool import _LocalPoolCache, _PoolConfig, _WarmPool
+from distripool.objects import _ObjectStore, _map_frames, _resolve_objects, _write_object
+from distripool.registry import _FunctionRegistry
+from distripool.stats import ChunkTimings, CompressionStats
+from distripool.transport import _Waker, _Pickled, _send_object, _loads
 
+_CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
 
-def _execute(f: str, f_name: str, *args, **kwargs):
-    exec(f)
-    func = locals()[f_name]
-    return func(*args, **kwargs)
+
+class _FunctionCache:
+    def __init__(self, maxsize: int = 128):
+        """
+        A bounded LRU cache of compiled functions keyed by the hash of their source code.
+        Every process (worker node and LocalPool subprocess alike) holds its own instance,
+        so each distinct function is compiled at most once per process.
+
+        :param maxsize: The maximum number of compiled functions to keep before evicting the least recently used one.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._functions: OrderedDict[str, Callable] = OrderedDict()
+
+    @staticmethod
+    def _compile(f: str, f_name: str) -> Callable:
+        namespace = {"__name__": "__distripool__"}
+        exec(compile(f, f"<distripool:{f_name}>", "exec"), namespace)
+        return namespace[f_name]
+
+    def get(self, f_hash: str, f: str, f_name: str) -> Callable:
+        key = f"{f_hash}:{f_name}"
+        func = self._functions.get(key)
+        if func is not None:
+            self.hits += 1
+            self._functions.move_to_end(key)
+            return func
+
+        self.misses += 1
+        func = self._compile(f, f_name)
+        self._functions[key] = func
+        if len(self._functions) > self.maxsize:
+            self._functions.popitem(last=False)
+        return func
+
+    def info(self) -> _CacheInfo:
+        return _CacheInfo(self.hits, self.misses, self.maxsize, len(self._functions))
+
+    def clear(self):
+        self._functions.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+_function_cache = _FunctionCache()
+_worker_ids = itertools.count()
+_SPILL_THRESHOLD = 1 << 20
+
+
+def _apply(func: Callable, args: tuple, kwargs: dict) -> Tuple[bool, Any]:
+    """
+    Call func, such that an error only fails this call rather than its whole chunk:
+    the result is (True, return value) or (False, exception).
+    """
+    try:
+        return True, func(*args, **kwargs)
+    except Exception as e:
+        return False, e
+
+
+def _execute_chunk(f_hash: str, f: str, f_name: str, mapping_type: str, chunk: _Pickled | str,
+                   objects: Dict[str, str],
+                   profile: bool = False) -> Tuple[_Pickled, float, float, float, Dict | None, int, int]:
+    """
+    Execute a whole chunk in a LocalPool subprocess. The chunk arrives as the frames the orchestrator pickled it into
+    (or as the path of a file in shared memory holding them), so the worker node never unpickles its elements,
+    and the results are pickled here, such that the worker node can send them on as they are.
+
+    :param objects: The local paths of the stored objects the chunk refers to, by key.
+    :param profile: If set, the execution runs under cProfile.
+    :return: A tuple of the pickled results, the time spent loading the chunk, executing it and pickling the results,
+    the raw cProfile stats of the execution (None if profile is not set), and the hits and misses of the function cache
+    of the process while loading the chunk.
+    """
+    started = time.perf_counter()
+    hits, misses = _function_cache.hits, _function_cache.misses
+    if isinstance(chunk, str):
+        chunk = _Pickled(_map_frames(chunk))
+    items = chunk.load()
+    if objects:
+        items = _resolve_objects(items, mapping_type, objects)
+    func = _function_cache.get(f_hash, f, f_name)
+    loaded = time.perf_counter()
+    hits, misses = _function_cache.hits - hits, _function_cache.misses - misses
+
+    profiler = cProfile.Profile() if profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        if mapping_type == 'map':
+            results = [func(item) for item in items]
+        elif mapping_type == 'starmap':
+            results = [func(*args) for args in items]
+        elif mapping_type == 'batch':
+            results = func(items)
+        else:
+            results = [_apply(func, args, kwargs) for args, kwargs in items]
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    executed = time.perf_counter()
+
+    stats = None
+    if profiler is not None:
+        profiler.create_stats()
+        stats = profiler.stats
+    results = _Pickled.dump(results)
+    return results, loaded - started, executed - loaded, time.perf_counter() - executed, stats, hits, misses
+
+
+def _endpoint(address: str) -> str:
+    return address if "://" in address else f"tcp://{address}"
+
+
+@dataclass
+class _RunningChunk:
+    """
+    A chunk executing on a local pool. Its parts run side by side as local processes become idle,
+    and their results are sent back in order. An error ends the chunk: it becomes its final part.
+    """
+    work: DataPacket
+    timings: ChunkTimings
+    started: float
+    warm: _WarmPool
+    last: int  # the index of the final part
+    next_start: int = 0
+    next_send: int = 0
+    executing: int = 0
+    results: Dict[int, Tuple[_Pickled, Dict | None]] = field(default_factory=dict)
+
+    @property
+    def pending(self) -> bool:
+        return self.next_start <= self.last
+
+    @property
+    def sent(self) -> bool:
+        return self.next_send > self.last
 
 
 class _Worker:
-    def __init__(self, connect_to: Tuple[str, str], processes: int | None = None):
-        self.context = zmq.Context()
-        self.receiver = self.context.socket(zmq.PULL)
-        self.receiver.connect(f"tcp://{connect_to[0]}")
+    def __init__(self, connect_to: Tuple[str, str], processes: int | None = None, prefetch: int = 0,
+                 object_store_size: int = 1 << 30, warm_pools: int = 4, pool_idle_timeout: float | None = None,
+                 prewarm: bool | Iterable[Tuple] = False, heartbeat_interval: float = 1.0,
+                 compression: str | Codec | None = None, compression_threshold: int = 4096,
+                 context: zmq.Context | None = None):
+        # a worker sharing the context of its orchestrator may connect through inproc:// rather than TCP.
+        self._owns_context = context is None
+        self.context = context if context is not None else zmq.Context()
+        self.receiver = self.context.socket(zmq.DEALER)
+        self.receiver.connect(_endpoint(connect_to[0]))
         self.sender = self.context.socket(zmq.PUSH)
-        self.sender.connect(f"tcp://{connect_to[1]}")
+        self.sender.connect(_endpoint(connect_to[1]))
 
         self._processes = processes if processes is not None else os.cpu_count()
-        self._initializer = None
-        self._initargs = None
-        self._maxtasksperchild = None
+        self._prefetch = prefetch
+        self._heartbeat_interval = heartbeat_interval
+        self._compressor = _Compressor(compression, compression_threshold) if compression is not None else None
+        self._compression = self._compressor.stats if self._compressor is not None else CompressionStats()
+        self.name = f"{socket.gethostname()}/{os.getpid()}/{next(_worker_ids)}"
+        self._functions = _FunctionRegistry()
+        self._objects = _ObjectStore(object_store_size)
+        self._spilled: Dict[Tuple[int, int, int, int], str] = {}
 
-    def _set_pool_variables(self, data: DataPacket):
-        self._initializer = data.initializer
-        self._initargs = data.initargs
-        self._maxtasksperchild = data.maxtasksperchild
+        self._local_pools = _LocalPoolCache(self._processes, warm_pools, pool_idle_timeout)
+        self._prewarm = [_PoolConfig(None, (), None)] if prewarm is True else [_PoolConfig(*c) for c in prewarm or ()]
+        self._queue: Deque[Tuple[DataPacket, ChunkTimings, float]] = deque()
+        self._running: Dict[Tuple[int, int, int], _RunningChunk] = {}  # the oldest first
+        self._busy = 0  # the number of local processes executing parts
+        # the finished parts of chunks, with the return value of _execute_chunk or the error it raised
+        self._finished: queue.SimpleQueue[Tuple[_RunningChunk, int, Tuple | BaseException]] = queue.SimpleQueue()
+        self._waker = _Waker()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closing = False
+        self._stopped = threading.Event()
 
-    def _pool_vars_are_unequal(self, data: DataPacket) -> bool:
-        return (data.initializer != self._initializer
-                or data.initargs != self._initargs
-                or data.maxtasksperchild != self._maxtasksperchild)
+    def _send(self, payload: ResultPacket):
+        _send_object(self.sender, payload, compressor=self._compressor)
 
-    @staticmethod
-    def _execute_on_socket(func, *args):
-        try:
-            return func(*args), True
-        except zmq.error.ContextTerminated:  # after using close() from another thread
-            return None, False
-        except zmq.error.ZMQError as e:
-            if e.errno == 128:  # "not a socket" after using close() from another thread
-                return None, False
-            raise e
+    def _send_control(self, message: ReadyPacket | HeartbeatPacket | CreditPacket | ReturnPacket):
+        _send_object(self.receiver, message, compressor=self._compressor)
 
-    def _send(self, payload: ResultPacket) -> bool:
-        _, ok = self._execute_on_socket(self.sender.send_pyobj, payload)
-        return ok
+    def compression_stats(self) -> CompressionStats:
+        """
+        :return: A snapshot of the compression of the results sent to the orchestrator and the time spent
+        decompressing the frames it sent. See make_worker's compression.
+        """
+        return dataclasses.replace(self._compression)
 
-    def _receive(self) -> Tuple[DataPacket | None, bool]:
-        return self._execute_on_socket(self.receiver.recv_pyobj)
+    def _resolve_function(self, work: DataPacket) -> bool:
+        if work.func is not None:
+            self._functions.put(work.func_hash, work.func)
+            return True
+        work.func = self._functions.get(work.func_hash)
+        return work.func is not None
 
-    @staticmethod
-    def _prepare_arguments(work: DataPacket):
-        if work.mapping_type == 'map':
-            return [(work.func, work.func_name) + (t,) for t in work.chunk]
-        if work.mapping_type == 'starmap':
-            return [(work.func, work.func_name) + t for t in work.chunk]
-
-    def _work_loop_with_initial(self, work: DataPacket) -> bool:
-        with LocalPool(processes=self._processes, initializer=self._initializer, initargs=self._initargs,
-                       maxtasksperchild=self._maxtasksperchild) as local_pool:
-            while True:
-                try:
-                    result = local_pool.starmap(_execute, self._prepare_arguments(work))
-                except Exception as e:
-                    print(e, flush=True, file=sys.stderr)
-                    result = e
-
-                ok = self._send(ResultPacket(work.id, result))
-                if not ok:
-                    return ok
-
-                work, ok = self._receive()
-                if not ok:
-                    return ok
-
-                if self._pool_vars_are_unequal(work):
-                    self._set_pool_variables(work)
-                    return True
+    def _prepare_chunk(self, work: DataPacket, part: int) -> _Pickled | str:
+        """
+        Large chunks are handed to the LocalPool through a file in shared memory rather than through its pipe.
+        """
+        chunk = work.chunk[part]
+        if sum(len(frame) for frame in chunk.frames) < _SPILL_THRESHOLD:
+            return chunk
+        path = self._objects.path(f"chunk-{work.job}-{work.id}-{work.attempt}-{part}")
+        _write_object(path, chunk.frames)
+        self._spilled[(work.job, work.id, work.attempt, part)] = path
+        return path
 
-    def start(self):
+    def _handle_messages(self):
+        while True:
+            try:
+                frames = self.receiver.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                return
+            timings = ChunkTimings(self.name, self._processes, received=time.time())
+            started = time.perf_counter()
+            try:
+                message = _loads(frames, self._compression)
+            except Exception as e:  # e.g. compressed with a codec unknown here; drop it, see make_worker
+                print(f"Dropped a message that could not be decoded: {e}", flush=True, file=sys.stderr)
+                continue
+            timings.deserialize = time.perf_counter() - started
+
+            if isinstance(message, ObjectPacket):
+                self._objects.put(message.key, message.frames)
+            elif isinstance(message, StealPacket):
+                stolen = [self._queue.pop()[0] for _ in range(min(message.count, len(self._queue)))]
+                [self._objects.release(work.objects) for work in stolen]
+                self._send_control(ReturnPacket(stolen[::-1]))
+            elif isinstance(message, CancelPacket):
+                self._cancel_queued(message.job)
+            elif self._resolve_function(message) and self._objects.acquire(message.objects):
+                timings.items = message.items
+                self._queue.append((message, timings, time.perf_counter()))
+            else:
+                # the orchestrator only ships a function's source and stored objects the first time; ask for them again.
+                self._send(ResultPacket(message.id, None, func_missing=True, job=message.job,
+                                        attempt=message.attempt))
+                self._send_control(CreditPacket(1))
+
+    def _cancel_queued(self, job: int):
         """
-        Start the _Worker instance to process tasks. Blocking.
+        Drop the queued chunks of the given job and hand their credits back. Chunks already running finish as usual.
         """
-        work, ok = self._receive()
-        if not ok:
+        kept = deque(item for item in self._queue if item[0].job != job)
+        [self._objects.release(item[0].objects) for item in self._queue if item[0].job == job]
+        if len(kept) < len(self._queue):
+            self._send_control(CreditPacket(len(self._queue) - len(kept)))
+        self._queue = kept
+
+    def _on_finished(self, chunk: _RunningChunk, part: int,
+                     executed: Tuple[_Pickled, float, float, float, Dict | None, int, int]):
+        self._finished.put((chunk, part, executed))
+        self._waker.wake()
+
+    def _on_failed(self, chunk: _RunningChunk, part: int, e: BaseException):
+        print(e, flush=True, file=sys.stderr)
+        self._finished.put((chunk, part, e))
+        self._waker.wake()
+
+    def _record_part(self, chunk: _RunningChunk, part: int, outcome: Tuple | BaseException):
+        timings = chunk.timings
+        timings.execute = max(timings.execute, time.perf_counter() - chunk.started)
+        if part > chunk.last:  # started before an earlier part failed
+            return
+        if isinstance(outcome, BaseException):
+            serialize_started = time.perf_counter()
+            try:
+                result = _Pickled.dump(outcome)
+            except Exception as e:
+                print(e, flush=True, file=sys.stderr)
+                result = _Pickled.dump(e)
+            timings.serialize += time.perf_counter() - serialize_started
+            chunk.last = part  # an error ends the chunk
+            chunk.results = {p: r for p, r in chunk.results.items() if p < part}
+            chunk.results[part] = (result, None)
             return
 
-        self._set_pool_variables(work)
+        results, load, compute, serialize, profile, hits, misses = outcome
+        timings.deserialize += load
+        timings.compute += compute
+        timings.serialize += serialize
+        timings.function_hits += hits
+        timings.function_misses += misses
+        chunk.results[part] = (results, profile)
 
-        while True:
-            ok = self._work_loop_with_initial(work)
-            if not ok:
+    def _send_parts(self, chunk: _RunningChunk):
+        work = chunk.work
+        while chunk.next_send in chunk.results:
+            part = chunk.next_send
+            result, profile = chunk.results.pop(part)
+            final = part == chunk.last
+            self._send(ResultPacket(work.id, result, job=work.job, attempt=work.attempt,
+                                    timings=chunk.timings if final else None, part=part, final=final, profile=profile))
+            chunk.next_send += 1
+
+    def _start_queued(self):
+        # a queued chunk gets the next idle process, ahead of the remaining parts of the running chunks.
+        while self._queue and self._busy < self._processes:
+            work, timings, queued_at = self._queue.popleft()
+            try:
+                config = _PoolConfig(work.initializer.load(), work.initargs.load(), work.maxtasksperchild)
+            except Exception as e:  # e.g. the module of the initializer is missing on this node
+                self._objects.release(work.objects)
+                self._send(ResultPacket(work.id, _Pickled.dump(e), job=work.job, attempt=work.attempt,
+                                        timings=timings))
+                self._send_control(CreditPacket(1))
+                continue
+            # chunks of different configurations may run side by side, but never more than processes parts at a time.
+            warm = self._local_pools.acquire(config)
+            started = time.perf_counter()
+            timings.queued = started - queued_at
+            chunk = _RunningChunk(work, timings, started, warm, last=len(work.chunk) - 1)
+            self._running[(work.job, work.id, work.attempt)] = chunk
+            self._start_part(chunk)
+
+        for chunk in list(self._running.values()):
+            while chunk.pending and self._busy < self._processes:
+                self._start_part(chunk)
+
+    def _start_part(self, chunk: _RunningChunk):
+        """
+        Hand the next part of the chunk to its local pool. The parts of a chunk spread over the idle local processes,
+        so that a job with fewer chunks than the cluster has processes still keeps them busy.
+        """
+        work, part = chunk.work, chunk.next_start
+        chunk.next_start += 1
+        chunk.executing += 1
+        self._busy += 1
+        objects = {key: self._objects.path(key) for key in work.objects}
+        chunk.warm.pool.apply_async(_execute_chunk, (work.func_hash, work.func, work.func_name, work.mapping_type,
+                                                     self._prepare_chunk(work, part), objects, work.profile),
+                                    callback=functools.partial(self._on_finished, chunk, part),
+                                    error_callback=functools.partial(self._on_failed, chunk, part))
+
+    def _remove_spilled(self, work: DataPacket, part: int):
+        path = self._spilled.pop((work.job, work.id, work.attempt, part), None)
+        if path is not None:
+            os.unlink(path)
+
+    def _send_finished(self):
+        credits = 0
+        while not self._finished.empty():
+            chunk, part, outcome = self._finished.get()
+            chunk.executing -= 1
+            self._busy -= 1
+            self._remove_spilled(chunk.work, part)
+            self._record_part(chunk, part, outcome)
+            self._send_parts(chunk)
+            if chunk.sent and chunk.executing == 0:
+                work = chunk.work
+                del self._running[(work.job, work.id, work.attempt)]
+                self._objects.release(work.objects)
+                self._local_pools.release(chunk.warm)
+                credits += 1
+        if credits > 0:
+            self._send_control(CreditPacket(credits))
+
+    def _loop(self):
+        poller = zmq.Poller()
+        poller.register(self.receiver, zmq.POLLIN)
+        poller.register(self._waker, zmq.POLLIN)
+
+        self._local_pools.prewarm(self._prewarm)
+        self._send_control(ReadyPacket(self._processes, self._prefetch, self.name))
+        next_heartbeat = time.monotonic() + self._heartbeat_interval
+        while not self._closing:
+            timeout = next_heartbeat - time.monotonic()
+            expires_in = self._local_pools.expire()
+            if expires_in is not None:
+                timeout = min(timeout, expires_in)
+            events = dict(poller.poll(max(0.0, timeout) * 1000))
+            if time.monotonic() >= next_heartbeat:
+                self._send_control(HeartbeatPacket(self._processes, self._prefetch, self.name))
+                next_heartbeat = time.monotonic() + self._heartbeat_interval
+            if self._waker.fileno() in events:
+                self._waker.clear()
+            if self.receiver in events:
+                self._handle_messages()
+            self._send_finished()
+            self._start_queued()
+
+    def start(self):
+        """
+        Start the _Worker instance to process tasks. Blocking.
+        """
+        with self._lock:
+            if self._closing:
                 return
+            self._started = True
+
+        try:
+            self._loop()
+        finally:
+            self._local_pools.close()
+            self._close_sockets()
+            self._objects.close()
+            self._stopped.set()
+
+    def _close_sockets(self):
+        self.receiver.close(linger=0)
+        self.sender.close(linger=0)
+        self._waker.close()
+        if self._owns_context:
+            self.context.term()
 
     def close(self):
         """
         Close the _Worker instance, including its sockets and context.
         This will terminate the work loop and thereby end any start() method, which will then return.
         """
-        self.receiver.close()
-        self.sender.close()
-        self.context.term()
+        with self._lock:
+            self._closing = True
+            started = self._started
+
+        if not started:
+            self._close_sockets()
+            self._objects.close()
+            return
+
+        self._waker.wake()
+        self._stopped.wait()
 
 
-def make_worker(orchestrator_address: Tuple[str, str], start: bool = True) -> _Worker:
+def make_worker(orchestrator_address: Tuple[str, str], start: bool = True,
+                processes: int | None = None, prefetch: int = 0, object_store_size: int = 1 << 30,
+                warm_pools: int = 4, pool_idle_timeout: float | None = None,
+                prewarm: bool | Iterable[Tuple] = False, heartbeat_interval: float = 1.0,
+                compression: str | Codec | None = None, compression_threshold: int = 4096) -> _Worker:
     """
     Create a new _Worker instance and call start on it if 'start' is set. Defaults to start the worker,
     which blocks the current thread.
@@ -118,9 +463,29 @@ def make_worker(orchestrator_address: Tuple[str, str], start: bool = True) -> _W
     The inbound socket is used to receive data to process from the orchestrator, while the outbound socket
     is used to send results back to the orchestrator.
     :param start: A boolean indicating whether to start the worker immediately. Defaults to True.
+    :param processes: The number of local processes, i.e. chunks executed concurrently. Defaults to os.cpu_count().
+    :param prefetch: The number of additional chunks the worker queues locally to hide network latency.
+    Queued chunks may be stolen by idle workers if the orchestrator enables work stealing.
+    :param object_store_size: The number of bytes of objects stored with Pool.put() the worker keeps
+    before evicting the least recently used ones.
+    :param warm_pools: The number of local process pools the worker keeps warm, one per configuration
+    (initializer, initargs and maxtasksperchild of the Pool), so that switching between jobs of a few configurations
+    does not restart processes and rerun initializers. The least recently used idle pool is terminated beyond that.
+    :param pool_idle_timeout: If not None, local process pools idle for that many seconds are terminated.
+    :param prewarm: Local process pools to start as the worker registers, rather than with its first chunk:
+    True for the default configuration of Pool, or an iterable of (initializer, initargs, maxtasksperchild) tuples.
+    :param heartbeat_interval: The number of seconds between the heartbeats the worker sends to the orchestrator,
+    which considers it gone once it misses heartbeats for the orchestrator's heartbeat_timeout.
+    :param compression: If not None, frames of at least compression_threshold bytes sent to the orchestrator
+    (mostly results) are compressed with this codec: 'zlib', 'lzma' or a Codec instance.
+    Frames that do not compress well are sent as they are; see worker.compression_stats().
+    A message compressed with a codec unknown to the receiving node (see register_codec) is dropped and logged
+    to stderr, so a custom Codec has to be registered on all nodes.
+    :param compression_threshold: The size in bytes below which frames are not compressed.
     :return: An instance of _Worker.
     """
-    worker = _Worker(orchestrator_address)
+    worker = _Worker(orchestrator_address, processes, prefetch, object_store_size, warm_pools, pool_idle_timeout,
+                     prewarm, heartbeat_interval, compression, compression_threshold)
     if start:
         worker.start()
     return worker
@@ -1,8 +1,14 @@
+import asyncio
 import multiprocessing
+import os
+import pickle
+import tempfile
 import threading
 import time
 import unittest
-from distripool import make_orchestrator, Pool, make_worker
+from distripool import make_orchestrator, Pool, AsyncPool, make_worker, ResultCache, read_results
+from distripool.packet import DataPacket
+from distripool.transport import _Pickled
 
 
 def square(x):
@@ -23,6 +29,53 @@ def wait(x):
     return x
 
 
+def squares(batch):
+    return [x * x for x in batch]
+
+
+def upper(batch):
+    return bytes(batch).upper()
+
+
+def process_name(x):
+    import multiprocessing
+    return multiprocessing.current_process().name
+
+
+def slow_process_name(x):
+    import multiprocessing
+    import time
+    time.sleep(0.1)
+    return multiprocessing.current_process().name
+
+
+def size(x):
+    return len(x)
+
+
+def lookup(table, key):
+    return table[key]
+
+
+def pair(a, b=0):
+    return a, b
+
+
+def as_buffer(x):
+    import pickle
+    return pickle.PickleBuffer(bytearray(x))
+
+
+def increment(buffer):
+    view = memoryview(buffer)
+    view[0] += 1
+    return bytes(view)
+
+
+def repeat(x):
+    return str(x) * 10_000
+
+
 class TestDistributedPool(unittest.TestCase):
     workers = []
     data = [i for i in range(20)]
@@ -51,6 +104,44 @@ class TestDistributedPool(unittest.TestCase):
         result = self.base_pool.map(square, self.data)
         self.assertEqual(result, self.expected_squares)
 
+    def test_map_batches(self):
+        self.assertEqual(self.base_pool.map_batches(squares, self.data, batch_size=6), self.expected_squares)
+        self.assertEqual(self.base_pool.map_batches(squares, iter(self.data), batch_size=6), self.expected_squares)
+        self.assertEqual(self.base_pool.map_batches(squares, self.data), self.expected_squares)
+
+    def test_map_batches_buffer(self):
+        data = bytearray(b"abcdefghij" * 1000)
+        self.assertEqual(self.base_pool.map_batches(upper, memoryview(data), batch_size=3000), bytes(data).upper())
+
+    def test_buffer_results_are_writable(self):
+        result, = self.base_pool.map(as_buffer, [b"abc"])
+        self.assertFalse(memoryview(result).readonly)
+        self.assertEqual(bytes(result), b"abc")
+
+    def test_arguments_are_writable(self):
+        data = [pickle.PickleBuffer(bytearray(b"\x01\x02"))]
+        self.assertEqual(self.base_pool.map(increment, data), [b"\x02\x02"])
+
+    def test_map_to(self):
+        results = []
+        self.assertEqual(self.base_pool.map_to(square, iter(self.data), results.append), len(self.data))
+        self.assertEqual(results, self.expected_squares)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results")
+            self.assertEqual(self.base_pool.map_to(square, self.data, path, chunksize=3), len(self.data))
+            self.assertEqual(list(read_results(path)), self.expected_squares)
+
+    def test_map_large_chunks(self):
+        # chunks above 1 MiB are handed to the local processes through shared memory
+        data = [bytes([i]) * 400_000 for i in range(6)]
+        result = self.base_pool.map(size, data, chunksize=3)
+        self.assertEqual(result, [400_000] * 6)
+
+    def test_map_adaptive(self):
+        result = self.base_pool.map(square, self.data, chunksize='adaptive')
+        self.assertEqual(result, self.expected_squares)
+
     def test_starmap(self):
         result = self.base_pool.starmap(sum, self.tuples_data)
         self.assertEqual(result, self.expected_sums)
@@ -96,10 +187,37 @@ class TestDistributedPool(unittest.TestCase):
         self.base_pool.map_async(raise_error, self.data, error_callback=error_callback)
         semaphore.acquire()
 
+    def test_map_async_concurrent(self):
+        squares = [self.base_pool.map_async(square, self.data, chunksize=3) for _ in range(10)]
+        sums = [self.base_pool.starmap_async(sum, self.tuples_data, chunksize=2) for _ in range(10)]
+        applies = [self.base_pool.apply_async(sum, (i, i)) for i in range(10)]
+
+        [self.assertEqual(r.get(), self.expected_squares) for r in squares]
+        [self.assertEqual(r.get(), self.expected_sums) for r in sums]
+        self.assertEqual([r.get() for r in applies], [2 * i for i in range(10)])
+
     def test_imap(self):
         result = [r for r in self.base_pool.imap(square, self.data)]
         self.assertEqual(result, self.expected_squares)
 
+    def test_imap_generator(self):
+        result = [r for r in self.base_pool.imap(square, (x for x in self.data), chunksize=3, parallel_calls=2)]
+        self.assertEqual(result, self.expected_squares)
+
+    def test_imap_adaptive(self):
+        result = [r for r in self.base_pool.imap(square, iter(self.data), chunksize='adaptive')]
+        self.assertEqual(result, self.expected_squares)
+
+    def test_imap_unordered(self):
+        result = [r for r in self.base_pool.imap_unordered(square, iter(self.data), chunksize=2)]
+        self.assertEqual(sorted(result), self.expected_squares)
+
+    def test_imap_abandoned(self):
+        for r in self.base_pool.imap(square, self.data, parallel_calls=4):
+            break
+        result = self.base_pool.map(square, self.data)
+        self.assertEqual(result, self.expected_squares)
+
     def test_starmap_async(self):
         result = self.base_pool.starmap_async(sum, self.tuples_data)
         self.assertEqual(result.get(), self.expected_sums)
@@ -119,5 +237,450 @@ class TestDistributedPool(unittest.TestCase):
         self.assertEqual(res.get(), 7)
 
 
+class TestWorkStealing(unittest.TestCase):
+    data = [i for i in range(40)]
+
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1339", "127.0.0.1:1340"), work_stealing=True)
+        self.worker = make_worker(("127.0.0.1:1339", "127.0.0.1:1340"), start=False, processes=1, prefetch=8)
+        threading.Thread(target=self.worker.start).start()
+        self.pool = Pool(processes=4, orchestrator=self.orchestrator)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.worker.close()
+        self.orchestrator.close()
+
+    def test_map(self):
+        result = self.pool.map(wait, [x / 1000 for x in self.data], chunksize=1)
+        self.assertEqual(result, [x / 1000 for x in self.data])
+
+    def test_imap(self):
+        result = [r for r in self.pool.imap(square, self.data, parallel_calls=16)]
+        self.assertEqual(result, [square(x) for x in self.data])
+
+
+class TestSpeculation(unittest.TestCase):
+    data = [i for i in range(12)]
+
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1341", "127.0.0.1:1342"))
+        # a worker node that accepts chunks but never executes them
+        self.hung_worker = make_worker(("127.0.0.1:1341", "127.0.0.1:1342"), start=False, processes=1)
+        self.hung_worker._start_queued = lambda: None
+        threading.Thread(target=self.hung_worker.start).start()
+        time.sleep(0.2)
+        self.pool = Pool(processes=2, orchestrator=self.orchestrator, speculative=True)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.hung_worker.close()
+        self.orchestrator.close()
+
+    def test_map(self):
+        result = self.pool.map(square, self.data, chunksize=1)
+        self.assertEqual(result, [square(x) for x in self.data])
+
+        stats = self.pool.speculation_stats()
+        self.assertGreaterEqual(stats.speculated, 1)
+        self.assertGreaterEqual(stats.won, 1)
+        self.assertGreater(stats.time_saved, 0)
+
+
+class TestStats(unittest.TestCase):
+    data = [i for i in range(20)]
+
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1343", "127.0.0.1:1344"))
+        self.chunks = []
+        self.jobs = []
+        self.pool = Pool(processes=2, orchestrator=self.orchestrator,
+                         chunk_callback=self.chunks.append, job_callback=self.jobs.append)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.orchestrator.close()
+
+    def test_profile(self):
+        pool = Pool(processes=2, orchestrator=self.orchestrator, profile=True, stream_size=2)
+        try:
+            self.assertIsNone(pool.profile_stats(square))
+            pool.map(square, self.data, chunksize=5)
+            pool.map(square, self.data, chunksize=5)
+            stats = pool.profile_stats(square)
+            calls = {function: (call_count, filename) for (filename, _, function), (_, call_count, *_) in
+                     stats.stats.items()}
+            self.assertEqual(calls["square"], (2 * len(self.data), "<distripool:square>"))
+            self.assertIsNone(self.pool.profile_stats(square))
+        finally:
+            pool.terminate()
+
+    def test_stats(self):
+        self.pool.map(square, self.data, chunksize=5)
+        self.pool.starmap(sum, [(1, 2)])
+
+        stats = self.pool.stats()
+        self.assertEqual(len(stats.jobs), 2)
+        self.assertEqual(stats.chunks, 5)
+        self.assertEqual(stats.items, 21)
+        self.assertGreater(stats.throughput, 0)
+        self.assertGreater(stats.bytes_sent, 0)
+        self.assertGreater(stats.bytes_received, 0)
+        self.assertEqual(stats.function_hits + stats.function_misses, 5)
+
+        job = stats.jobs[0]
+        self.assertEqual(job.func_name, "square")
+        self.assertEqual(job.items, 20)
+        self.assertEqual(job.function_hits + job.function_misses, 4)
+        self.assertEqual(len(job.utilization), 1)
+
+        self.assertEqual(len(self.chunks), 5)
+        self.assertEqual(self.jobs, stats.jobs)
+        for timings in self.chunks:
+            self.assertGreater(timings.returned, timings.sent)
+            self.assertGreaterEqual(timings.sent, timings.submitted)
+            self.assertGreater(timings.execute, 0)
+            self.assertGreaterEqual(timings.execute, timings.compute / timings.processes)
+
+
+class TestApplyBatching(unittest.TestCase):
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1347", "127.0.0.1:1348"))
+        self.pool = Pool(processes=2, orchestrator=self.orchestrator, apply_batch_size=16, apply_linger=0.05)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.orchestrator.close()
+
+    def test_apply_async(self):
+        results = [self.pool.apply_async(sum, (i,), {"b": 1}) for i in range(40)]
+        self.assertEqual([r.get(timeout=10) for r in results], [i + 1 for i in range(40)])
+        # 40 calls of the same function fit into three packets
+        self.assertEqual(self.pool.stats().chunks, 3)
+
+    def test_error_fails_only_its_call(self):
+        ok = self.pool.apply_async(square, (3,))
+        failed = self.pool.apply_async(raise_error, (3,))
+        self.assertEqual(ok.get(timeout=10), 9)
+        with self.assertRaises(ValueError):
+            failed.get(timeout=10)
+        self.assertFalse(failed.successful())
+
+    def test_callbacks(self):
+        results, errors = [], []
+        done = threading.Semaphore(0)
+        self.pool.apply_async(square, (2,), callback=lambda r: (results.append(r), done.release()))
+        self.pool.apply_async(raise_error, (2,), error_callback=lambda e: (errors.append(e), done.release()))
+        self.assertTrue(done.acquire(timeout=10) and done.acquire(timeout=10))
+        self.assertEqual(results, [4])
+        self.assertIsInstance(errors[0], ValueError)
+
+
+class TestStreaming(unittest.TestCase):
+    data = [i for i in range(20)]
+
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1353", "127.0.0.1:1354"))
+        self.pool = Pool(processes=1, orchestrator=self.orchestrator, stream_size=3)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.orchestrator.close()
+
+    def test_map(self):
+        self.assertEqual(self.pool.map(square, self.data, chunksize=10), [square(x) for x in self.data])
+        self.assertEqual(sorted(self.pool.imap_unordered(square, self.data, chunksize=10)),
+                         [square(x) for x in self.data])
+        self.assertEqual(self.pool.stats().chunks, 4)
+
+    def test_first_results_arrive_before_chunk_is_done(self):
+        started = time.monotonic()
+        results = self.pool.imap(wait, [0.3] * 6, chunksize=6)
+        self.assertEqual(next(results), 0.3)
+        self.assertLess(time.monotonic() - started, 1.2)
+        self.assertEqual(list(results), [0.3] * 5)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            self.pool.map(raise_error, self.data, chunksize=10)
+
+
+class TestResultCache(unittest.TestCase):
+    data = [i for i in range(20)]
+
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1355", "127.0.0.1:1356"))
+        self.pool = Pool(processes=2, orchestrator=self.orchestrator, result_cache=ResultCache())
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.orchestrator.close()
+
+    def test_only_misses_are_dispatched(self):
+        self.assertEqual(self.pool.map(square, self.data), [square(x) for x in self.data])
+        self.assertEqual(self.pool.map(square, self.data[10:] + [20, 21]), [square(x) for x in range(10, 22)])
+        self.assertEqual(self.pool.starmap(sum, [(1, 2), (3, 4)]), [3, 7])
+        self.assertEqual(self.pool.apply(sum, (1, 2)), 3)
+        self.assertEqual(self.pool.stats().items, 24)
+
+    def test_map_and_starmap_are_cached_separately(self):
+        data = [(1, 2), (3, 4)]
+        self.assertEqual(self.pool.map(pair, data), [((1, 2), 0), ((3, 4), 0)])
+        self.assertEqual(self.pool.starmap(pair, data), [(1, 2), (3, 4)])
+
+    def test_error_is_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.pool.map(raise_error, [1])
+        with self.assertRaises(ValueError):
+            self.pool.map(raise_error, [1])
+
+
+class TestSharedOrchestrator(unittest.TestCase):
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1357", "127.0.0.1:1358"))
+        self.backfill = Pool(processes=1, orchestrator=self.orchestrator)
+        self.interactive = Pool(processes=1, orchestrator=self.orchestrator, priority=1)
+
+    def tearDown(self):
+        self.backfill.terminate()
+        self.interactive.terminate()
+        self.orchestrator.close()
+
+    def test_pools_share_orchestrator(self):
+        self.assertFalse(self.orchestrator.free)
+        self.assertEqual(self.backfill.map(square, range(10)), [square(x) for x in range(10)])
+        self.assertEqual(self.interactive.map(square, range(10)), [square(x) for x in range(10)])
+
+    def test_priority_preempts_queued_chunks(self):
+        finished = []
+        backfill = threading.Thread(target=lambda: finished.append(self.backfill.map(wait, [0.05] * 40, chunksize=1)))
+        backfill.start()
+        time.sleep(0.2)
+
+        self.assertEqual(self.interactive.map(square, range(4), chunksize=1), [0, 1, 4, 9])
+        self.assertEqual(finished, [])
+        backfill.join()
+
+    def test_unpicklable_initializer_fails_its_own_call(self):
+        pool = Pool(orchestrator=self.orchestrator, initializer=lambda: None)
+        try:
+            with self.assertRaises((pickle.PicklingError, AttributeError)):
+                pool.map_async(square, range(4)).get(timeout=5)
+        finally:
+            pool.terminate()
+        self.assertTrue(self.orchestrator._loop_thread.is_alive())
+        self.assertEqual(self.interactive.map(square, range(4)), [0, 1, 4, 9])
+
+    def test_terminate_drops_queued_chunks(self):
+        result = self.backfill.map_async(wait, [0.05] * 40, chunksize=1)
+        time.sleep(0.2)
+        self.backfill.terminate()
+        self.assertIsInstance(result._async.future.exception(timeout=5), RuntimeError)
+        self.assertEqual(len(self.orchestrator._queue), 0)
+        self.assertEqual(self.interactive.map(square, range(4)), [0, 1, 4, 9])
+
+    def test_closed_job_drops_work_and_fails_receive(self):
+        job = self.orchestrator._open_job()
+        self.orchestrator._close_job(job)
+        self.orchestrator._send_work(DataPacket(0, None, "square", [_Pickled.dump([1])], job=job))
+        self.assertEqual(len(self.orchestrator._queue), 0)
+        with self.assertRaises(RuntimeError):
+            self.orchestrator._receive_result(job, timeout=1)
+
+    def test_objects_are_kept_until_all_pools_delete_them(self):
+        ref = self.backfill.put({"a": 1})
+        self.assertEqual(self.interactive.put({"a": 1}), ref)
+        self.backfill.delete(ref)
+        self.assertEqual(self.interactive.starmap(lookup, [(ref, "a")]), [1])
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1359", "127.0.0.1:1360"), compression="zlib")
+        self.pool = Pool(orchestrator=self.orchestrator)
+        self.worker = make_worker(("127.0.0.1:1359", "127.0.0.1:1360"), start=False, processes=8,
+                                  compression="zlib")
+        threading.Thread(target=self.worker.start).start()
+        time.sleep(0.3)
+
+    def tearDown(self):
+        self.worker.close()
+        self.pool.terminate()
+        self.orchestrator.close()
+
+    def test_compressed_chunks_and_results(self):
+        data = [str(i) * 10_000 for i in range(20)]
+        self.assertEqual(self.pool.map(size, data, chunksize=1), [len(x) for x in data])
+        self.assertGreater(self.orchestrator.compression_stats().bytes_saved, 0)
+
+        self.assertEqual(self.pool.map(repeat, range(20), chunksize=1), [repeat(x) for x in range(20)])
+        self.assertGreater(self.worker.compression_stats().bytes_saved, 0)
+        self.assertGreater(self.orchestrator.compression_stats().decompress_time, 0)
+
+    def test_undecodable_message_is_dropped(self):
+        import zmq
+        context = zmq.Context()
+        push = context.socket(zmq.PUSH)
+        push.connect("tcp://127.0.0.1:1360")
+        push.send_multipart([b"unknown\0\x01", b"frame"])
+        time.sleep(0.2)
+        push.close()
+        context.term()
+
+        self.assertTrue(self.orchestrator._loop_thread.is_alive())
+        self.assertEqual(self.pool.map(square, range(4)), [0, 1, 4, 9])
+
+    def test_compressed_objects(self):
+        table = self.pool.put({key: "v" * 10_000 for key in range(10)})
+        result = self.pool.starmap(lookup, [(table, key) for key in range(10)], chunksize=1)
+        self.assertEqual(result, ["v" * 10_000] * 10)
+
+
+class TestObjectStore(unittest.TestCase):
+    table = {i: str(i) * 100 for i in range(100)}
+
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1349", "127.0.0.1:1350"))
+        self.pool = Pool(processes=2, orchestrator=self.orchestrator)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.orchestrator.close()
+
+    def test_put(self):
+        ref = self.pool.put(self.table)
+        keys = list(range(0, 100, 5))
+
+        result = self.pool.starmap(lookup, [(ref, key) for key in keys], chunksize=2)
+        self.assertEqual(result, [self.table[key] for key in keys])
+        self.assertEqual(self.pool.apply(lookup, (ref, 7)), self.table[7])
+
+        # the table was shipped once, rather than with each of the 10 chunks
+        self.assertLess(self.pool.stats().bytes_sent, 3 * ref.size)
+
+    def test_delete(self):
+        ref = self.pool.put(self.table)
+        self.pool.delete(ref)
+        with self.assertRaises(KeyError):
+            self.pool.starmap(lookup, [(ref, 1)])
+
+
+class TestClusterMembership(unittest.TestCase):
+    data = [i for i in range(12)]
+
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1351", "127.0.0.1:1352"), heartbeat_timeout=0.5)
+        self.pool = Pool(orchestrator=self.orchestrator)
+        self.worker = make_worker(("127.0.0.1:1351", "127.0.0.1:1352"), start=False, processes=3,
+                                  heartbeat_interval=0.1)
+        threading.Thread(target=self.worker.start).start()
+        time.sleep(0.3)
+
+    def tearDown(self):
+        self.worker.close()
+        self.pool.terminate()
+        self.orchestrator.close()
+
+    def test_capacity(self):
+        self.assertEqual(self.orchestrator.capacity(), multiprocessing.cpu_count() + 3)
+        self.assertEqual(self.pool._capacity(), multiprocessing.cpu_count() + 3)
+
+        self.worker.close()
+        time.sleep(1.0)
+        self.assertEqual(self.orchestrator.capacity(), multiprocessing.cpu_count())
+
+    def test_chunks_of_a_leaving_worker_are_redispatched(self):
+        self.worker._start_queued = lambda: None  # accepts chunks but never executes them
+
+        threading.Timer(0.3, self.worker.close).start()
+        result = self.pool.map(square, self.data, chunksize=1)
+        self.assertEqual(result, [square(x) for x in self.data])
+
+    def test_chunks_are_spread_over_local_processes(self):
+        pool = Pool(processes=1, orchestrator=self.orchestrator)
+        try:
+            names = pool.map(slow_process_name, range(8))
+        finally:
+            pool.terminate()
+        self.assertGreater(len(set(names)), 1)
+
+    def test_map_by_key(self):
+        self.assertEqual(self.pool.map_by_key(square, self.data, key=lambda x: x % 3), [square(x) for x in self.data])
+
+        names = self.pool.map_by_key(process_name, range(40), key=lambda x: x % 5, chunksize=1)
+        worker_names = {process.name for warm in self.worker._local_pools._pools for process in warm.pool._pool}
+        for key in range(5):
+            key_names = set(names[key::5])
+            self.assertTrue(key_names <= worker_names or key_names.isdisjoint(worker_names))
+
+
+class TestAsyncPool(unittest.TestCase):
+    data = [i for i in range(20)]
+
+    def setUp(self):
+        self.orchestrator = make_orchestrator(("127.0.0.1:1345", "127.0.0.1:1346"))
+        self.pool = AsyncPool(processes=2, orchestrator=self.orchestrator)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.orchestrator.close()
+
+    def test_map(self):
+        result = asyncio.run(self.pool.map(square, self.data))
+        self.assertEqual(result, [square(x) for x in self.data])
+
+    def test_starmap_apply(self):
+        async def run():
+            return await self.pool.starmap(sum, [(1, 2), (3, 4)]), await self.pool.apply(sum, (5, 6))
+
+        self.assertEqual(asyncio.run(run()), ([3, 7], 11))
+
+    def test_map_batches(self):
+        result = asyncio.run(self.pool.map_batches(squares, self.data, batch_size=6))
+        self.assertEqual(result, [square(x) for x in self.data])
+
+    def test_map_to(self):
+        results = []
+        self.assertEqual(asyncio.run(self.pool.map_to(square, self.data, results.append)), len(self.data))
+        self.assertEqual(results, [square(x) for x in self.data])
+
+    def test_imap(self):
+        async def run():
+            ordered = [x async for x in self.pool.imap(square, iter(self.data), chunksize=3)]
+            unordered = [x async for x in self.pool.imap_unordered(square, self.data, chunksize=3)]
+            return ordered, unordered
+
+        ordered, unordered = asyncio.run(run())
+        self.assertEqual(ordered, [square(x) for x in self.data])
+        self.assertEqual(sorted(unordered), [square(x) for x in self.data])
+
+    def test_gather(self):
+        async def run():
+            return await asyncio.gather(*(self.pool.map(square, self.data, chunksize=4) for _ in range(4)))
+
+        self.assertEqual(asyncio.run(run()), [[square(x) for x in self.data]] * 4)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(self.pool.map(raise_error, self.data))
+
+    def test_cancel(self):
+        async def run():
+            task = asyncio.create_task(self.pool.map(wait, [0.5] * 8, chunksize=1))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            started = time.perf_counter()
+            result = await self.pool.map(square, self.data)
+            return result, time.perf_counter() - started
+
+        result, duration = asyncio.run(run())
+        self.assertEqual(result, [square(x) for x in self.data])
+        # the queued chunks of the cancelled job were dropped rather than executed.
+        self.assertLess(duration, 2.0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+
+from distripool.cache import ResultCache, _CachedMap
+
+
+def square(x):
+    return x * x
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lru(self):
+        cache = ResultCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.info(), (2, 1, 2, 2))
+
+    def test_ttl(self):
+        cache = ResultCache(path=self.path, ttl=0.05)
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        cache.close()
+
+    def test_persists_on_disk(self):
+        cache = ResultCache(path=self.path)
+        cache.put("a", [1, 2])
+        cache.close()
+
+        cache = ResultCache(path=self.path)
+        self.assertEqual(cache.get("a"), [1, 2])
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+        cache.close()
+
+    def test_disk_size_limit(self):
+        cache = ResultCache(maxsize=0, path=self.path, max_disk_bytes=3000)
+        for key in "abcd":
+            cache.put(key, key * 1000)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("d"), "d" * 1000)
+        cache.close()
+
+    def test_put_many(self):
+        cache = ResultCache(maxsize=0, path=self.path, max_disk_bytes=3100)
+        cache.put_many([(key, key * 1000) for key in "abcd"])
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("d"), "d" * 1000)
+        cache.close()
+
+        cache = ResultCache(maxsize=0, path=self.path, max_disk_bytes=3100)
+        cache.put("e", "e" * 1000)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "c" * 1000)
+        cache.close()
+
+    def test_cached_map(self):
+        cache = ResultCache()
+        cached = _CachedMap(cache, square, [1, 2, 3])
+        self.assertEqual(cached.misses, [1, 2, 3])
+        self.assertEqual(cached.merge([1, 4, 9]), [1, 4, 9])
+
+        cached = _CachedMap(cache, square, [3, 4, 1])
+        self.assertEqual(cached.misses, [4])
+        self.assertEqual(cached.merge([16]), [9, 16, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
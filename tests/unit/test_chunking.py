@@ -0,0 +1,67 @@
+import unittest
+
+import pickle
+
+from distripool.chunking import _AdaptiveChunker, _FixedChunker, _SliceChunker, _KeyedChunker, \
+    _chunk_length
+from distripool.routing import _route
+
+
+class TestChunking(unittest.TestCase):
+    def test_fixed(self):
+        chunks = list(_FixedChunker((x for x in range(7)), 3))
+        self.assertEqual(chunks, [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_adaptive_probes_then_grows(self):
+        chunker = _AdaptiveChunker(iter(range(10_000)), capacity=2, target_duration=0.1)
+        self.assertEqual(len(next(chunker)), 1)
+        self.assertEqual(len(next(chunker)), 1)
+
+        chunker.observe(1, elapsed=0.001, roundtrip=0.002)
+        self.assertAlmostEqual(len(next(chunker)), 100, delta=1)
+
+    def test_adaptive_respects_overhead(self):
+        chunker = _AdaptiveChunker(iter(range(10_000)), capacity=2, target_duration=0.1)
+        chunker.observe(1, elapsed=0.001, roundtrip=0.051)
+        self.assertAlmostEqual(len(next(chunker)), 500, delta=1)
+
+    def test_adaptive_tapers_off(self):
+        data = list(range(1000))
+        chunker = _AdaptiveChunker(data, capacity=4, target_duration=1)
+        next(chunker)
+        chunker.observe(1, elapsed=0.001, roundtrip=0.001)
+
+        sizes = [len(chunk) for chunk in chunker]
+        self.assertEqual(sum(sizes), len(data) - 1)
+        self.assertEqual(sizes[0], 250)
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+        self.assertEqual(sizes[-1], 1)
+
+    def test_slices(self):
+        self.assertEqual(list(_SliceChunker(list(range(7)), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(_SliceChunker(iter(range(7)), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_slices_of_buffers_are_not_copied(self):
+        data = bytearray(b"abcdefg")
+        chunks = list(_SliceChunker(memoryview(data), 3))
+        self.assertTrue(all(isinstance(chunk, pickle.PickleBuffer) for chunk in chunks))
+        self.assertEqual([_chunk_length(chunk) for chunk in chunks], [3, 3, 1])
+        data[0] = ord("z")
+        self.assertEqual(bytes(chunks[0]), b"zbc")
+
+    def test_keyed(self):
+        data = ["a1", "b1", "a2", "c1", "a3", "b2", "d1"]
+        owners = {_route(key): owner for key, owner in zip("abcd", [0, 1, 0, 1])}
+
+        chunker = _KeyedChunker(data, lambda item: item[0], 2, 1, owners.get)
+        chunks = list(chunker)
+        self.assertEqual([item for chunk in chunks for item in chunk], [data[i] for i in chunker.order])
+        self.assertEqual(sorted(chunker.order), list(range(len(data))))
+        for chunk in chunks:
+            self.assertEqual(len({owners[_route(item[0])] for item in chunk}), 1)
+        a_items = [item for chunk in chunks for item in chunk if item[0] == "a"]
+        self.assertEqual(a_items, ["a1", "a2", "a3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import unittest
+
+from distripool.compression import Codec, ZlibCodec, _Compressor, _codecs, _decompress, register_codec
+from distripool.stats import CompressionStats
+
+
+class Reverse(Codec):
+    name = "reverse"
+
+    def compress(self, data) -> bytes:
+        return bytes(data)[:len(data) // 2]
+
+    def decompress(self, data) -> bytes:
+        return bytes(data) * 2
+
+
+class TestCompressor(unittest.TestCase):
+    def test_round_trip(self):
+        compressor = _Compressor("zlib", threshold=100)
+        frames = [b"a" * 10_000, b"small", bytearray(b"b" * 1000)]
+        header, compressed = compressor.compress(frames, "DataPacket")
+        self.assertTrue(header.startswith(b"zlib\0"))
+        self.assertEqual(compressed[1], b"small")
+        self.assertLess(len(compressed[0]), 100)
+
+        stats = CompressionStats()
+        self.assertEqual([bytes(frame) for frame in _decompress(header, compressed, stats)], [bytes(f) for f in frames])
+        self.assertEqual(compressor.stats.frames, 2)
+        self.assertGreater(compressor.stats.bytes_saved, 10_000)
+        self.assertGreater(stats.decompress_time, 0)
+
+    def test_below_threshold(self):
+        compressor = _Compressor("lzma", threshold=4096)
+        header, frames = compressor.compress([b"a" * 4095], "DataPacket")
+        self.assertEqual(header, b"")
+        self.assertEqual(_decompress(header, frames), [b"a" * 4095])
+
+    def test_incompressible_frames_are_sampled(self):
+        compressor = _Compressor("zlib", threshold=100, probe_interval=4)
+        tries = []
+        compress = compressor.codec.compress
+        compressor.codec = ZlibCodec()
+        compressor.codec.compress = lambda data: tries.append(len(data)) or compress(data)
+
+        for _ in range(9):
+            header, frames = compressor.compress([os.urandom(1000)], "ResultPacket")
+            self.assertEqual(header, b"")
+        self.assertEqual(len(tries), 3)  # the first frame, then every fourth
+
+        header, _ = compressor.compress([b"a" * 1000], "DataPacket")  # other kinds are tracked separately
+        self.assertNotEqual(header, b"")
+
+    def test_custom_codec(self):
+        compressor = _Compressor(Reverse(), threshold=1)
+        self.assertIn("reverse", _codecs)
+        header, frames = compressor.compress([b"ab" * 10], "DataPacket")
+        self.assertEqual(frames, [b"ab" * 5])
+        self.assertEqual(_decompress(header, frames), [b"ab" * 10])
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            _Compressor("snappy")
+        with self.assertRaises(ValueError):
+            _decompress(b"snappy\0\x01", [b"frame"])
+        register_codec(ZlibCodec(level=9))
+        self.assertEqual(_codecs["zlib"].level, 9)
+        register_codec(ZlibCodec())
+
+
+if __name__ == "__main__":
+    unittest.main()
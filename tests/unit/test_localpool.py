@@ -0,0 +1,78 @@
+import time
+import unittest
+
+from distripool.localpool import _LocalPoolCache, _PoolConfig
+
+
+class _FakePool:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.terminated = False
+
+    def terminate(self):
+        self.terminated = True
+
+
+class TestLocalPoolCache(unittest.TestCase):
+    a = _PoolConfig(None, (), None)
+    b = _PoolConfig(print, ([1],), None)  # unhashable initargs
+    c = _PoolConfig(None, (), 10)
+
+    def test_reuses_warm_pools(self):
+        cache = _LocalPoolCache(2, factory=_FakePool)
+        first = cache.get(self.a)
+        cache.get(self.b)
+        self.assertIs(cache.get(_PoolConfig(None, (), None)), first)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(first.pool.kwargs["processes"], 2)
+
+    def test_lru_eviction_skips_running_pools(self):
+        cache = _LocalPoolCache(1, maxsize=2, factory=_FakePool)
+        a = cache.acquire(self.a)
+        b = cache.get(self.b)
+        cache.get(self.a)
+        c = cache.get(self.c)
+
+        self.assertTrue(b.pool.terminated)
+        self.assertFalse(a.pool.terminated)
+        self.assertEqual(len(cache), 2)
+
+        cache.release(a)
+        cache.get(self.b)
+        self.assertTrue(a.pool.terminated)
+        self.assertFalse(c.pool.terminated)
+
+    def test_new_pool_is_not_evicted(self):
+        cache = _LocalPoolCache(1, maxsize=1, factory=_FakePool)
+        a = cache.acquire(self.a)
+        b = cache.acquire(self.c)
+        self.assertFalse(b.pool.terminated)
+        self.assertEqual(len(cache), 2)
+
+        cache.release(a)
+        self.assertTrue(a.pool.terminated)
+        self.assertFalse(b.pool.terminated)
+
+    def test_idle_timeout(self):
+        cache = _LocalPoolCache(1, idle_timeout=0.05, factory=_FakePool)
+        idle = cache.get(self.a)
+        busy = cache.acquire(self.b)
+        self.assertLessEqual(cache.expire(), 0.05)
+
+        time.sleep(0.06)
+        self.assertIsNone(cache.expire())
+        self.assertTrue(idle.pool.terminated)
+        self.assertFalse(busy.pool.terminated)
+
+    def test_prewarm_and_close(self):
+        cache = _LocalPoolCache(1, factory=_FakePool)
+        cache.prewarm([self.a, self.b])
+        self.assertEqual(len(cache), 2)
+        pools = [cache.get(self.a), cache.get(self.b)]
+        cache.close()
+        self.assertEqual(len(cache), 0)
+        self.assertTrue(all(warm.pool.terminated for warm in pools))
+
+
+if __name__ == "__main__":
+    unittest.main()
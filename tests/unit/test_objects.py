@@ -0,0 +1,74 @@
+import os
+import unittest
+
+from distripool.objects import ObjectRef, _ObjectStore, _dump_object, _read_object, _resolve_objects, _references
+
+
+class TestObjectStore(unittest.TestCase):
+    def setUp(self):
+        self.store = _ObjectStore(max_bytes=1000)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_roundtrip(self):
+        obj = {"table": list(range(10)), "data": bytearray(b"x" * 100)}
+        key, frames = _dump_object(obj)
+        self.store.put(key, frames)
+        self.assertIn(key, self.store)
+        self.assertEqual(_read_object(self.store.path(key)), obj)
+
+    def test_content_hash(self):
+        self.assertEqual(_dump_object([1, 2])[0], _dump_object([1, 2])[0])
+        self.assertNotEqual(_dump_object([1, 2])[0], _dump_object([1, 3])[0])
+
+    def test_lru_eviction(self):
+        keys = []
+        for i in range(3):
+            key, frames = _dump_object(bytes([i]) * 400)
+            self.store.put(key, frames)
+            keys.append(key)
+
+        self.assertNotIn(keys[0], self.store)
+        self.assertFalse(os.path.exists(self.store.path(keys[0])))
+        self.assertIn(keys[2], self.store)
+        self.assertLessEqual(self.store.size, 1000)
+
+    def test_pinned_objects_are_kept(self):
+        first, frames = _dump_object(b"a" * 600)
+        self.store.put(first, frames)
+        self.assertTrue(self.store.acquire([first]))
+
+        second, frames = _dump_object(b"b" * 600)
+        self.store.put(second, frames)
+        self.assertIn(first, self.store)
+
+        self.store.release([first])
+        self.assertNotIn(first, self.store)
+        self.assertFalse(self.store.acquire([first]))
+
+
+class TestReferences(unittest.TestCase):
+    ref = ObjectRef("k", 1)
+
+    def test_references(self):
+        self.assertEqual(_references([1, self.ref, 2], 'map'), ("k",))
+        self.assertEqual(_references([(self.ref, 1), (self.ref, 2)], 'starmap'), ("k",))
+        self.assertEqual(_references([((1,), {"table": self.ref})], 'apply'), ("k",))
+        self.assertEqual(_references([[self.ref]], 'map'), ())
+
+    def test_resolve_objects(self):
+        store = _ObjectStore()
+        try:
+            key, frames = _dump_object({"a": 1})
+            store.put(key, frames)
+            ref = ObjectRef(key, 1)
+            paths = {key: store.path(key)}
+            self.assertEqual(_resolve_objects([(ref, "a")], 'starmap', paths), [({"a": 1}, "a")])
+            self.assertEqual(_resolve_objects([((), {"t": ref})], 'apply', paths), [((), {"t": {"a": 1}})])
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
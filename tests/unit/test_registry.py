@@ -0,0 +1,30 @@
+import unittest
+
+from distripool.registry import _FunctionRegistry, _describe_function, _source_hash
+
+
+def square(x):
+    return x * x
+
+
+class TestFunctionRegistry(unittest.TestCase):
+    def test_describe_function(self):
+        f_hash, source = _describe_function(square)
+        self.assertIn("def square(x):", source)
+        self.assertEqual(f_hash, _source_hash(source))
+
+    def test_lru_eviction(self):
+        registry = _FunctionRegistry(maxsize=2)
+        registry.put("a", "source a")
+        registry.put("b", "source b")
+        registry.get("a")
+        registry.put("c", "source c")
+
+        self.assertIn("a", registry)
+        self.assertNotIn("b", registry)
+        self.assertEqual(registry.get("c"), "source c")
+        self.assertIsNone(registry.get("b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from distripool.routing import _Ring, _route
+
+
+class TestRouting(unittest.TestCase):
+    routes = [_route(key) for key in range(3000)]
+
+    def owners(self, ring: _Ring):
+        return [ring.owner(route) for route in self.routes]
+
+    def test_route_is_stable(self):
+        self.assertEqual(_route("model-a"), _route("model-a"))
+        self.assertNotEqual(_route("model-a"), _route("model-b"))
+
+    def test_empty(self):
+        self.assertIsNone(_Ring().owner(_route(1)))
+
+    def test_shares_follow_weights(self):
+        owners = self.owners(_Ring([("a", 1, b"a"), ("b", 3, b"b")]))
+        self.assertAlmostEqual(owners.count(b"b") / len(owners), 0.75, delta=0.05)
+
+    def test_minimal_movement(self):
+        before = self.owners(_Ring([("a", 2, b"a"), ("b", 2, b"b"), ("c", 2, b"c")]))
+        after = self.owners(_Ring([("a", 2, b"a"), ("b", 2, b"b"), ("c", 2, b"c"), ("d", 2, b"d")]))
+        # only routes moving to the new worker change their owner
+        self.assertTrue(all(old == new or new == b"d" for old, new in zip(before, after)))
+        self.assertAlmostEqual(after.count(b"d") / len(after), 0.25, delta=0.05)
+
+        removed = self.owners(_Ring([("a", 2, b"a"), ("c", 2, b"c")]))
+        self.assertTrue(all(old == new for old, new in zip(before, removed) if old != b"b"))
+
+    def test_owner_follows_name_not_identity(self):
+        before = self.owners(_Ring([("a", 1, b"1"), ("b", 1, b"2")]))
+        after = self.owners(_Ring([("a", 1, b"3"), ("b", 1, b"2")]))
+        self.assertEqual([{b"1": b"3"}.get(owner, owner) for owner in before], after)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+from distripool.packet import DataPacket
+from distripool.scheduler import _Scheduler
+
+
+def work(job: int, chunk: int) -> tuple:
+    return DataPacket(chunk, None, "f", [], job=job), False
+
+
+def anything(work: DataPacket) -> bool:
+    return True
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = _Scheduler()
+
+    def drain(self):
+        order = []
+        while (item := self.scheduler.pop(anything)) is not None:
+            order.append(item[0].job)
+        return order
+
+    def test_fifo_within_share(self):
+        for chunk in range(3):
+            self.scheduler.append(work(0, chunk))
+        self.assertEqual([self.scheduler.pop(anything)[0].id for _ in range(3)], [0, 1, 2])
+        self.assertIsNone(self.scheduler.pop(anything))
+
+    def test_priority(self):
+        low, high = self.scheduler.open_share(priority=0), self.scheduler.open_share(priority=1)
+        self.scheduler.assign(0, low)
+        self.scheduler.assign(1, high)
+        for chunk in range(3):
+            self.scheduler.append(work(0, chunk))
+        for chunk in range(2):
+            self.scheduler.append(work(1, chunk))
+        self.assertEqual(self.drain(), [1, 1, 0, 0, 0])
+
+    def test_close_share_drops_its_work(self):
+        share = self.scheduler.open_share()
+        self.scheduler.assign(0, share)
+        self.scheduler.append(work(0, 0))
+        self.scheduler.append(work(1, 0))
+        self.scheduler.close_share(share)
+        self.assertEqual(self.drain(), [1])
+
+    def test_weighted_fair_share(self):
+        light, heavy = self.scheduler.open_share(weight=1), self.scheduler.open_share(weight=3)
+        self.scheduler.assign(0, light)
+        self.scheduler.assign(1, heavy)
+        for chunk in range(8):
+            self.scheduler.append(work(0, chunk))
+            self.scheduler.append(work(1, chunk))
+        self.assertEqual(self.drain()[:8].count(1), 6)
+
+    def test_refilled_share_does_not_catch_up(self):
+        a, b = self.scheduler.open_share(), self.scheduler.open_share()
+        self.scheduler.assign(0, a)
+        self.scheduler.assign(1, b)
+        for chunk in range(10):
+            self.scheduler.append(work(0, chunk))
+        for _ in range(6):
+            self.scheduler.pop(anything)
+        for chunk in range(4):
+            self.scheduler.append(work(1, chunk))
+        self.assertEqual(sorted(self.drain()[:4]), [0, 0, 1, 1])
+
+    def test_skips_ineligible_work(self):
+        self.scheduler.append(work(0, 0))
+        self.scheduler.append(work(0, 1))
+        self.assertEqual(self.scheduler.pop(lambda w: w.id == 1)[0].id, 1)
+        self.assertEqual(len(self.scheduler), 1)
+
+    def test_requeue_and_forget(self):
+        share = self.scheduler.open_share()
+        self.scheduler.assign(0, share)
+        self.scheduler.append(work(0, 2))
+        self.scheduler.requeue([work(0, 0), work(0, 1)])
+        self.assertEqual(self.scheduler.pop(anything)[0].id, 0)
+
+        self.scheduler.forget(0)
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_invalid_weight(self):
+        with self.assertRaises(ValueError):
+            self.scheduler.open_share(weight=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+
+from distripool.spill import _ResultWriter, _result_sink, read_results
+
+
+class TestSpill(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        writer = _ResultWriter(self.path)
+        results = [1, "two", {"three": 3}, b"\x00" * 1000, None]
+        for result in results:
+            writer(result)
+        writer.close()
+        self.assertEqual(writer.count, len(results))
+        self.assertEqual(list(read_results(self.path)), results)
+
+    def test_empty(self):
+        _ResultWriter(self.path).close()
+        self.assertEqual(list(read_results(self.path)), [])
+
+    def test_sink(self):
+        self.assertIs(_result_sink(print), print)
+        writer = _result_sink(self.path)
+        self.assertIsInstance(writer, _ResultWriter)
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import pickle
+import unittest
+
+import zmq
+
+from distripool.compression import _Compressor
+from distripool.stats import CompressionStats
+from distripool.transport import _Pickled, _Waker, _dumps, _receive_object, _send_object
+
+
+class Blob:
+    def __init__(self, data: bytearray):
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        return Blob._rebuild, (pickle.PickleBuffer(self.data),)
+
+    @staticmethod
+    def _rebuild(buffer):
+        return Blob(bytearray(buffer))
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.context = zmq.Context()
+        self.a = self.context.socket(zmq.PAIR)
+        self.a.bind("inproc://test_transport")
+        self.b = self.context.socket(zmq.PAIR)
+        self.b.connect("inproc://test_transport")
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+        self.context.term()
+
+    def test_out_of_band_buffers(self):
+        blob = Blob(bytearray(b"x" * 100_000))
+        self.assertEqual(len(_dumps([blob, 1])), 2)
+
+        _send_object(self.a, {"blob": blob, "n": 1})
+        _, received = _receive_object(self.b)
+        self.assertEqual(received["blob"].data, blob.data)
+        self.assertEqual(received["n"], 1)
+
+    def test_envelope(self):
+        _send_object(self.a, "payload", [b"identity"])
+        envelope, received = _receive_object(self.b, envelope=1)
+        self.assertEqual(envelope, [b"identity"])
+        self.assertEqual(received, "payload")
+
+    def test_pickled(self):
+        blob = Blob(bytearray(b"y" * 100_000))
+        _send_object(self.a, [_Pickled.dump({"blob": blob}), 2])
+        _, (pickled, n) = _receive_object(self.b)
+        self.assertEqual(pickled.load()["blob"].data, blob.data)
+        self.assertEqual(n, 2)
+
+    def test_compression(self):
+        blob = Blob(bytearray(b"z" * 100_000))
+        compressor = _Compressor("zlib")
+        sent = _send_object(self.a, {"blob": blob}, [b"identity"], compressor=compressor)
+        self.assertLess(sent, 10_000)
+
+        stats = CompressionStats()
+        envelope, received = _receive_object(self.b, envelope=1, stats=stats)
+        self.assertEqual(envelope, [b"identity"])
+        self.assertEqual(received["blob"].data, blob.data)
+        self.assertEqual(compressor.stats.frames, 1)
+
+    def test_waker(self):
+        waker = _Waker()
+        poller = zmq.Poller()
+        poller.register(waker, zmq.POLLIN)
+        self.assertEqual(poller.poll(0), [])
+
+        waker.wake()
+        self.assertEqual(len(poller.poll(100)), 1)
+        waker.clear()
+        self.assertEqual(poller.poll(0), [])
+        waker.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
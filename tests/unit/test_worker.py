@@ -0,0 +1,88 @@
+import unittest
+
+import os
+import tempfile
+
+from distripool.objects import _write_object
+from distripool.registry import _source_hash
+from distripool.transport import _Pickled
+from distripool.worker import _FunctionCache, _execute_chunk
+
+square_source = '''
+def square(x):
+    return x * x
+'''
+
+factorial_source = '''
+def factorial(n):
+    return 1 if n <= 1 else n * factorial(n - 1)
+'''
+
+
+class TestFunctionCache(unittest.TestCase):
+    def test_compiles_once(self):
+        cache = _FunctionCache()
+        h = _source_hash(square_source)
+
+        f = cache.get(h, square_source, "square")
+        self.assertEqual(f(3), 9)
+        self.assertIs(cache.get(h, square_source, "square"), f)
+        self.assertEqual(cache.info().hits, 1)
+        self.assertEqual(cache.info().misses, 1)
+
+    def test_lru_eviction(self):
+        cache = _FunctionCache(maxsize=1)
+        square_hash = _source_hash(square_source)
+        factorial_hash = _source_hash(factorial_source)
+
+        cache.get(square_hash, square_source, "square")
+        cache.get(factorial_hash, factorial_source, "factorial")
+        self.assertEqual(cache.info().currsize, 1)
+
+        cache.get(square_hash, square_source, "square")
+        self.assertEqual(cache.info().misses, 3)
+
+    def test_recursive_function(self):
+        factorial = _FunctionCache().get(_source_hash(factorial_source), factorial_source, "factorial")
+        self.assertEqual(factorial(5), 120)
+
+
+class TestExecuteChunk(unittest.TestCase):
+    square_hash = _source_hash(square_source)
+
+    def execute(self, mapping_type, chunk):
+        results, *durations, profile, hits, misses = _execute_chunk(self.square_hash, square_source, "square",
+                                                                    mapping_type, chunk, {})
+        self.assertTrue(all(duration >= 0 for duration in durations))
+        self.assertIsNone(profile)
+        self.assertEqual(hits + misses, 1)
+        return results.load()
+
+    def test_mapping_types(self):
+        self.assertEqual(self.execute('map', _Pickled.dump([1, 2, 3])), [1, 4, 9])
+        self.assertEqual(self.execute('starmap', _Pickled.dump([(2,), (3,)])), [4, 9])
+
+        results = self.execute('apply', _Pickled.dump([((2,), {}), (("a",), {})]))
+        self.assertEqual(results[0], (True, 4))
+        self.assertFalse(results[1][0])
+        self.assertIsInstance(results[1][1], TypeError)
+
+    def test_profile(self):
+        results, _, _, _, profile, _, _ = _execute_chunk(self.square_hash, square_source, "square", 'map',
+                                                         _Pickled.dump([1, 2, 3]), {}, profile=True)
+        self.assertEqual(results.load(), [1, 4, 9])
+        calls = {function: stats[1] for (_, _, function), stats in profile.items()}
+        self.assertEqual(calls["square"], 3)
+
+    def test_chunk_in_shared_memory(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            _write_object(path, _Pickled.dump([4, 5]).frames)
+            self.assertEqual(self.execute('map', path), [16, 25])
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    unittest.main()